@@ -0,0 +1,60 @@
+"""Memoized type introspection against recomputing it on every call.
+
+Resolves generic field contexts the way non-strict item lookups do, through ``SourceMapping.instanceof``, once with
+the cached introspection of :mod:`datamapping._helpers.generics` and once with the uncached functions it wraps.
+
+Run from the repository root::
+
+    python -m benchmarks.generics [calls]
+"""
+import sys
+import time
+from typing import Generic, List, TypeVar
+
+from datamapping import SourceMapping
+from datamapping._helpers import generics
+
+T = TypeVar("T", bound=object)
+
+
+class Node(Generic[T]):
+    pass
+
+
+def uncached_instanceof(obj, kls):
+    """``SourceMapping.instanceof`` as it was before introspection was memoized."""
+    is_generic_type = generics.is_generic_type.__wrapped__
+    get_parameters = generics.get_parameters.__wrapped__
+    get_origin = generics.get_origin.__wrapped__
+    get_args = generics.get_args.__wrapped__
+    if not is_generic_type(kls):
+        return isinstance(obj, kls)
+    obj_tp = generics.get_generic_type(obj)
+    templates = list(generics.get_bound(t) or t.__constraints__ for t in get_parameters(get_origin(kls)))
+    if issubclass(type(obj), get_origin(kls)):
+        for bound, obj_sub_tp in zip(templates, get_args(obj_tp)):
+            if not issubclass(obj_sub_tp, bound):
+                return False
+        return True
+
+
+def measure(instanceof, cases, calls):
+    started = time.perf_counter()
+    for _ in range(calls // len(cases)):
+        for obj, kls in cases:
+            instanceof(obj, kls)
+    elapsed = time.perf_counter() - started
+    return dict(seconds=round(elapsed, 3), calls_per_second=round(calls / elapsed))
+
+
+def main(calls=200000):
+    cases = [(Node[int](), Node[int]), (Node[str](), Node[object]), ([], List[object]), ("value", str)]
+    results = {"uncached": measure(uncached_instanceof, cases, calls),
+               "memoized": measure(SourceMapping.instanceof, cases, calls)}
+    for name, result in results.items():
+        print(f"{name:>9}: {result}")
+    return results
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,79 @@
+"""Streaming JSON source against ``json.load`` + ``map_item`` on nested documents.
+
+Run from the repository root::
+
+    python -m benchmarks.json_stream [records]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Text
+
+from datamapping import SourceMapping, FieldMapping, MapTo, mappable
+
+
+@mappable
+@dataclass
+class Order(object):
+    id: Text = field(default=None)
+    status: Text = field(default=None)
+    customer: Text = field(default=None)
+    city: Text = field(default=None)
+
+
+class OrderMapping(SourceMapping):
+    target_collection = Order
+    id = MapTo()
+    status = MapTo()
+    customer = FieldMapping(Order.customer, path="customer.name")
+    city = FieldMapping(Order.city, path="customer.address.city")
+
+    @property
+    def store_unmapped(self):
+        return False
+
+
+def document(i):
+    return dict(id=str(i), status="open",
+                customer=dict(name=f"customer {i}", address=dict(city="Springfield", street=f"{i} Main St"),
+                              history=[dict(order=j, total=j * 1.5) for j in range(10)]),
+                lines=[dict(sku=f"sku-{j}", quantity=j, notes="x" * 40) for j in range(20)])
+
+
+def measure(run):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = run()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(items=count, seconds=round(elapsed, 3), items_per_second=round(count / elapsed),
+                peak_mib=round(peak / 2 ** 20, 1))
+
+
+def main(records=20000):
+    mapping = OrderMapping()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "orders.json")
+        with open(path, "w") as file:
+            json.dump([document(i) for i in range(records)], file)
+
+        def baseline():
+            with open(path) as source:
+                return sum(1 for _ in map(mapping.map_item, json.load(source)))
+
+        def streaming():
+            return sum(1 for _ in mapping.map_json(path))
+
+        results = {"json.load + map_item": measure(baseline), "map_json": measure(streaming)}
+    for name, result in results.items():
+        print(f"{name:>22}: {result}")
+    return results
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,125 @@
+"""Memory held by the core objects and by annotated runs.
+
+:class:`~datamapping.mappable.MappingInfo` and :class:`~datamapping.source.AnnotatedValue` are compared with copies of
+their former unslotted layout, the annotated run is repeated with the unslotted ``AnnotatedValue``. ``FieldMapping`` is
+only measured, on CPython 3.11 and later instance attributes are stored inline whether or not it is slotted.
+
+Run from the repository root::
+
+    python -m benchmarks.memory [instances]
+"""
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Text, Any
+from unittest import mock
+
+from datamapping import SourceMapping, FieldMapping, MapTo, mappable
+from datamapping import source
+from datamapping.mappable import MappingInfo
+from datamapping.source import AnnotatedValue
+
+
+@mappable
+@dataclass
+class Order(object):
+    id: Text = field(default=None)
+    status: Text = field(default=None)
+    customer: Text = field(default=None)
+    city: Text = field(default=None)
+
+
+def status(value, key):
+    """Normalizes the status."""
+    return value.lower()
+
+
+class OrderMapping(SourceMapping):
+    target_collection = Order
+    id = MapTo()
+    status = MapTo(converter=status)
+    customer = FieldMapping(Order.customer, path="customer.name")
+    city = FieldMapping(Order.city, path="customer.city")
+
+
+class UnslottedMappingInfo(object):
+    """The former layout of MappingInfo."""
+
+    def __init__(self, owner, name, val_type):
+        self.owner = owner
+        self.name = name
+        self.type = val_type
+
+    def __getattr__(self, item):
+        return getattr(self.type, item)
+
+
+@dataclass
+class UnslottedAnnotatedValue(object):
+    """The former layout of AnnotatedValue, annotations in the instance dictionary."""
+    value: Any
+
+    def __setattr__(self, key, value):
+        if key != "value":
+            key = "@" + key.lstrip("@")
+        super().__setattr__(key, value)
+
+
+def annotated_value(i, value_cls=AnnotatedValue):
+    value = value_cls(str(i))
+    value.path = "customer.name"
+    value.MethodExecuted = "status"
+    value.MethodDocstring = ["Normalizes the status."]
+    return value
+
+
+def per_instance(create, instances):
+    """Average number of bytes allocated per object created by `create`."""
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = [create(i) for i in range(instances)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The list holding the objects is not part of their size.
+    return round((after - before - sys.getsizeof(objects)) / len(objects))
+
+
+def annotated_run(records, value_cls=AnnotatedValue):
+    """Bytes held per record by the items of an annotated run whose values are wrapped in `value_cls`."""
+    rows = [dict(id=str(i), status="OPEN", customer=dict(name=f"customer {i}", city="Springfield"))
+            for i in range(records)]
+    mapping = OrderMapping(should_annotate=True)
+    with mock.patch.object(source, "AnnotatedValue", value_cls):
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        items = mapping.map_all(rows)
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return dict(bytes_per_record=round((after - before - sys.getsizeof(items)) / len(items)),
+                peak_mib=round((peak - before) / 2 ** 20, 1))
+
+
+def compare(unslotted, slotted):
+    saved = round(unslotted - slotted, 1)
+    return dict(unslotted=unslotted, slotted=slotted, saved=saved, saved_percent=round(100 * saved / unslotted, 1))
+
+
+def main(instances=20000):
+    unslotted_run = annotated_run(instances, UnslottedAnnotatedValue)
+    slotted_run = annotated_run(instances)
+    results = {
+        "FieldMapping bytes": per_instance(lambda i: FieldMapping("id", path=f"field{i}"), instances),
+        "MappingInfo bytes": compare(per_instance(lambda i: UnslottedMappingInfo(Order, "id", Text), instances),
+                                     per_instance(lambda i: MappingInfo(Order, "id", Text), instances)),
+        "AnnotatedValue bytes": compare(per_instance(lambda i: annotated_value(i, UnslottedAnnotatedValue), instances),
+                                        per_instance(annotated_value, instances)),
+        "annotated run bytes per record": compare(unslotted_run["bytes_per_record"], slotted_run["bytes_per_record"]),
+        "annotated run peak MiB": compare(unslotted_run["peak_mib"], slotted_run["peak_mib"]),
+    }
+    for name, result in results.items():
+        print(f"{name:>30}: {result}")
+    return results
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,194 @@
+"""Throughput and memory of typical workloads.
+
+Each workload maps synthetic records and reports items per second, from a run without memory tracing, and the peak
+memory of a second, traced, run. Results can be written to a JSON file and compared with the results of another commit.
+
+Run from the repository root::
+
+    python -m benchmarks.suite [--records N] [--output results.json] [--compare baseline.json] [workload ...]
+    python runner.py benchmark [same arguments]
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field, make_dataclass
+from typing import Text, List
+
+from datamapping import SourceMapping, ListMapper, FieldMapping, MapTo, mappable
+from datamapping.field import EmbeddedValues
+
+WIDE_COLUMNS = 60
+
+
+@mappable
+@dataclass
+class Line(object):
+    sku: Text = field(default=None)
+    quantity: int = field(default=None)
+    price: float = field(default=None)
+
+
+@mappable
+@dataclass
+class Invoice(object):
+    id: Text = field(default=None)
+    customer: Text = field(default=None)
+    city: Text = field(default=None)
+    country: Text = field(default=None)
+    total: float = field(default=None)
+    status: Text = field(default=None)
+    lines: List[Line] = field(default_factory=list)
+
+    def add_line(self, line):
+        self.lines.append(line)
+
+
+Wide = make_dataclass("Wide", [(f"column{i}", Text, field(default=None)) for i in range(WIDE_COLUMNS)])
+mappable(Wide)
+
+WideMapping = type("WideMapping", (SourceMapping,), dict(
+    target_collection=Wide, **{f"column{i}": MapTo() for i in range(WIDE_COLUMNS)}))
+
+
+class LineMapping(ListMapper):
+    target_collection = Line
+    sku = MapTo()
+    quantity = MapTo()
+    price = MapTo()
+
+
+class AddressMapping(SourceMapping):
+    city = MapTo(Invoice.city)
+    country = FieldMapping(Invoice.country, path="country.code")
+
+
+class CustomerMapping(SourceMapping):
+    name = MapTo(Invoice.customer)
+    address = EmbeddedValues(AddressMapping)
+
+
+class NestedMapping(SourceMapping):
+    target_collection = Invoice
+    id = MapTo()
+    status = MapTo()
+    customer = EmbeddedValues(CustomerMapping)
+
+
+class ListMapping(SourceMapping):
+    target_collection = Invoice
+    id = MapTo()
+    lines = FieldMapping(Invoice.add_line, LineMapping)
+
+
+def to_float(value, key):
+    """Parses an amount."""
+    return float(value.replace(",", ""))
+
+
+def normalize(value, key):
+    """Normalizes a code."""
+    return value.strip().upper()
+
+
+class ConverterMapping(SourceMapping):
+    target_collection = Invoice
+    id = MapTo(converter=normalize)
+    customer = MapTo(converter=normalize)
+    city = MapTo(converter=normalize)
+    country = MapTo(converter=normalize)
+    status = MapTo(converter=normalize)
+    total = MapTo(converter=to_float)
+
+
+def wide_row(i):
+    return {f"column{column}": f"{i}-{column}" for column in range(WIDE_COLUMNS)}
+
+
+def nested_row(i):
+    return dict(id=str(i), status="open",
+                customer=dict(name=f"customer {i}", address=dict(city="Springfield", country=dict(code="US"))))
+
+
+def list_row(i):
+    return dict(id=str(i), lines=[dict(sku=f"sku-{line}", quantity=line, price=line * 1.5) for line in range(10)])
+
+
+def converter_row(i):
+    return dict(id=f" inv-{i} ", customer=f" customer {i} ", city=" springfield ", country=" us ", status=" open ",
+                total=f"{i},000.50")
+
+
+# name: (mapping factory, row generator)
+WORKLOADS = {
+    "flat_wide": (WideMapping, wide_row),
+    "nested": (NestedMapping, nested_row),
+    "list_fan_out": (ListMapping, list_row),
+    "annotated": (lambda: NestedMapping(should_annotate=True), nested_row),
+    "converters": (ConverterMapping, converter_row),
+}
+
+
+def run(name, records):
+    create, row = WORKLOADS[name]
+    rows = [row(i) for i in range(records)]
+    mapping = create()
+    mapping.map_all(rows[:10])
+    started = time.perf_counter()
+    count = sum(1 for _ in mapping.map_many(rows))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    items = mapping.map_all(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return dict(items=count, seconds=round(elapsed, 4), items_per_second=round(count / elapsed),
+                peak_mib=round(peak / 2 ** 20, 2))
+
+
+def commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    for name, result in results.items():
+        before = baseline.get("workloads", {}).get(name)
+        if before:
+            ratio = result["items_per_second"] / before["items_per_second"]
+            print(f"{name:>14}: {ratio:.2f}x items/s, {result['peak_mib'] - before['peak_mib']:+.2f} MiB peak "
+                  f"against {baseline.get('commit')}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("workloads", nargs="*", help=f"workloads to run, all by default: {', '.join(WORKLOADS)}")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this JSON file")
+    arguments = parser.parse_args(argv)
+    for name in arguments.workloads:
+        if name not in WORKLOADS:
+            parser.error(f"unknown workload {name}")
+    results = {}
+    for name in arguments.workloads or WORKLOADS:
+        results[name] = run(name, arguments.records)
+        print(f"{name:>14}: {results[name]}")
+    report = dict(commit=commit(), python=platform.python_version(), records=arguments.records, workloads=results)
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            compare(results, json.load(file))
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,10 +1,20 @@
+import asyncio
+import io
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
 from dataclasses import field, dataclass, make_dataclass
 from typing import Text, List
 from unittest import TestCase
 
 from datamapping.mappable import mappable
-from datamapping import FieldMapping, MapTo, Ignore, TBD
-from datamapping import SourceMapping
+from datamapping import FieldMapping, MapTo, Ignore, TBD, MappingError, map_to
+from datamapping.field import EmbeddedValues
+from datamapping import SourceMapping, ListMapper
 
 
 @mappable
@@ -32,6 +42,28 @@ simple_row = dict(verb_id="TestRow",
                   ))
 
 
+def upper_case(value, key):
+    return value.upper()
+
+
+class ParallelMapping(SourceMapping):
+    target_collection = RootData
+    verb_id = MapTo(converter=upper_case)
+    special_case = FieldMapping(RootData.id, path="special_case.an_id")
+
+
+class DeepListMapping(ListMapper):
+    target_collection = Deeper
+    info = MapTo(Deeper.info)
+    root_id = MapTo(RootData.verb_id)
+
+
+class ConcurrentMapping(SourceMapping):
+    target_collection = RootData
+    id = MapTo(converter=upper_case)
+    deep = FieldMapping(RootData.add_something, DeepListMapping)
+
+
 class TestFieldMapping(TestCase):
     def test_set_name(self):
         class MyMapping(SourceMapping):
@@ -156,3 +188,1217 @@ class TestFieldMapping(TestCase):
         assert sh.f == "fsdf"
         assert sh.bob() == "Hellloooooo"
 
+
+
+class TestMappingPlan(TestCase):
+    def test_plan_is_compiled_once_per_class(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+
+        assert BasicMapping.get_plan() is BasicMapping.get_plan()
+        assert BasicMapping.get_plan() is not SourceMapping.get_plan()
+
+    def test_heading_falls_back_to_lower_case(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+
+        item = BasicMapping().map_item({"VERB_ID": "Upper"})
+        assert item.verb_id == "Upper"
+        assert len(BasicMapping.get_mappings("VERB_ID")) == 1
+        assert BasicMapping.get_mappings("missing") == []
+
+    def test_converter_call_shapes(self):
+        def with_key(value, key):
+            return f"{key}:{value}"
+
+        def keyword_only(*, value):
+            return value * 2
+
+        def positional(raw):
+            return raw.lower()
+
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo(converter=with_key)
+            id = MapTo(converter=keyword_only)
+            somethings_deep = MapTo(converter=positional)
+
+        item = BasicMapping().map_item(dict(verb_id="v", id="i", somethings_deep="LOW"))
+        assert item.verb_id == "verb_id:v"
+        assert item.id == "ii"
+        assert item.somethings_deep == "low"
+
+    def test_ignored_fields_are_not_stored(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = Ignore()
+
+        item = BasicMapping().map_item(dict(verb_id="v"))
+        assert item.verb_id is None
+
+
+class TestMapMany(TestCase):
+    def test_map_many_list_rows(self):
+        completed = []
+
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+            id = MapTo()
+
+            def mapping_complete(self, item=None):
+                completed.append(item)
+
+        rows = (["verb", str(i)] for i in range(3))
+        items = BasicMapping().map_many(rows, headings=["verb_id", "ID"])
+        assert completed == []
+        items = list(items)
+        assert [item.id for item in items] == ["0", "1", "2"]
+        assert completed == items
+
+    def test_map_all_skips_ignored_entries(self):
+        from datamapping import IgnoreEntry
+
+        def only_even(value):
+            if int(value) % 2:
+                raise IgnoreEntry()
+            return value
+
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=only_even)
+
+        items = BasicMapping().map_all(dict(id=str(i)) for i in range(5))
+        assert [item.id for item in items] == ["0", "2", "4"]
+
+    def test_map_item_does_not_skip_ignored_entries(self):
+        from datamapping import IgnoreEntry
+
+        def ignore(value):
+            raise IgnoreEntry()
+
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=ignore)
+
+        with self.assertRaises(IgnoreEntry):
+            BasicMapping().map_item(dict(id="1"))
+
+
+class TestMapParallel(TestCase):
+    rows = [dict(verb_id=f"verb{i}", special_case=dict(an_id=str(i))) for i in range(25)]
+
+    def test_mappings_pickle(self):
+        mapping = pickle.loads(pickle.dumps(ParallelMapping(should_annotate=True)))
+        assert mapping.should_annotate
+        assert pickle.loads(pickle.dumps(map_to("verb_id"))).target.attribute == "verb_id"
+        pickle.dumps(Ignore())
+
+    def test_map_parallel_ordered(self):
+        items = list(ParallelMapping().map_parallel(self.rows, workers=2, chunksize=4))
+        assert items == ParallelMapping().map_all(self.rows)
+        assert items[3].verb_id == "VERB3"
+
+    def test_map_parallel_unordered(self):
+        items = list(ParallelMapping().map_parallel(self.rows, workers=2, chunksize=4, ordered=False))
+        assert sorted(int(item.id) for item in items) == list(range(25))
+
+    def test_local_mappings_are_rejected(self):
+        class LocalMapping(SourceMapping):
+            target_collection = RootData
+
+        with self.assertRaises(MappingError):
+            list(LocalMapping().map_parallel(self.rows, workers=1))
+
+
+class TestMappingContext(TestCase):
+    rows = [dict(id=f"row{i}", deep=[dict(info=f"{i}.{j}", root_id=f"verb{i}") for j in range(i % 4)])
+            for i in range(200)]
+
+    def assert_mapped(self, row, item):
+        assert item.id == row["id"].upper()
+        assert item.verb_id == (f"verb{row['id'][3:]}" if row["deep"] else None)
+        assert [deeper.info for deeper in item.somethings_deep] == [deep["info"] for deep in row["deep"]]
+
+    def test_mapping_holds_no_record_state(self):
+        mapping = ConcurrentMapping()
+        before = dict(vars(mapping))
+        mapping.map_all(self.rows[:5])
+        assert vars(mapping) == before
+
+    def test_re_entrant_mapping(self):
+        mapping = ConcurrentMapping()
+
+        class OuterMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=upper_case)
+            verb_id = MapTo(converter=lambda value: mapping.map_item(value).id)
+
+        item = OuterMapping().map_item(dict(id="outer", verb_id=dict(id="inner", deep=[])))
+        assert item.id == "OUTER"
+        assert item.verb_id == "INNER"
+
+    def test_map_threaded(self):
+        items = list(ConcurrentMapping().map_threaded(self.rows, workers=8, chunksize=3))
+        assert len(items) == len(self.rows)
+        for row, item in zip(self.rows, items):
+            self.assert_mapped(row, item)
+
+    def test_shared_mapping_stress(self):
+        mapping = ConcurrentMapping()
+        errors = []
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+        def work():
+            try:
+                for _ in range(5):
+                    for row in self.rows:
+                        self.assert_mapped(row, mapping.map_item(row))
+            except BaseException as ex:
+                errors.append(ex)
+
+        try:
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        assert errors == []
+
+
+class TestMapCsv(TestCase):
+    csv_text = "VERB_ID,id,extra\r\nv1,1,x\r\nv2,2\r\n"
+
+    def test_map_csv(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+            id = MapTo()
+
+        items = list(BasicMapping().map_csv(io.StringIO(self.csv_text, newline="")))
+        assert [(item.verb_id, item.id) for item in items] == [("v1", "1"), ("v2", "2")]
+        assert items[0].extra == "x"
+        assert not hasattr(items[1], "extra")
+
+    def test_unmapped_columns_are_skipped(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+
+            @property
+            def store_unmapped(self):
+                return False
+
+        from datamapping.delimited import bind_columns
+        assert [index for index, _, _ in bind_columns(BasicMapping(), ["VERB_ID", "id", "extra"])] == [1]
+
+    def test_map_csv_path(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rows.txt")
+            with open(path, "w", newline="") as file:
+                file.write("verb_id|id\nv1|1\n")
+            items = list(BasicMapping().map_csv(path, delimiter="|"))
+        assert items[0].verb_id == "v1"
+        assert items[0].id == "1"
+
+
+class TestMapFixedWidth(TestCase):
+    def map(self, content, layout):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+            id = MapTo()
+
+            @property
+            def store_unmapped(self):
+                return False
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "extract.dat")
+            with open(path, "wb") as file:
+                file.write(content)
+            return list(BasicMapping().map_fixed_width(path, layout))
+
+    def test_new_line_records(self):
+        from datamapping.fixedwidth import FixedWidthLayout
+        layout = FixedWidthLayout([("id", 0, 4), ("filler", 4, 2), ("VERB_ID", 6, 5, "cp1252")])
+        items = self.map(b"0001  v\xe9rb1\r\n0002  verb2\n0003", layout)
+        assert [(item.id, item.verb_id) for item in items] == [("0001", "vérb1"), ("0002", "verb2"), ("0003", "")]
+
+    def test_fixed_length_records(self):
+        from datamapping.fixedwidth import FixedWidthLayout
+        layout = FixedWidthLayout([("verb_id", 3, 3), ("id", 0, 3)], record_length=6)
+        items = self.map(b"001abc002def", layout)
+        assert [(item.id, item.verb_id) for item in items] == [("001", "abc"), ("002", "def")]
+
+
+class TestMapJson(TestCase):
+    documents = [dict(verb_id=f"v{i}", special_case=dict(an_id=str(i), a_phrase="unused"), unused=[1, {"x": "]"}])
+                 for i in range(20)]
+
+    class ProjectedMapping(SourceMapping):
+        target_collection = RootData
+        verb_id = MapTo()
+        special_case = FieldMapping(RootData.id, path="special_case.an_id")
+
+        @property
+        def store_unmapped(self):
+            return False
+
+    def test_projection_skips_unused_subtrees(self):
+        from datamapping.jsonstream import iter_json, Projection
+        projection = Projection.of(self.ProjectedMapping())
+        records = list(iter_json(io.StringIO(json.dumps(self.documents)), projection, chunk_size=16))
+        assert records[3] == dict(verb_id="v3", special_case=dict(an_id="3"))
+        assert len(records) == 20
+
+    def test_map_json_array(self):
+        items = list(self.ProjectedMapping().map_json(io.StringIO(json.dumps(self.documents)), chunk_size=32))
+        assert [item.id for item in items] == [str(i) for i in range(20)]
+
+    def test_map_json_lines(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+
+        lines = "\n".join(json.dumps(document) for document in self.documents)
+        items = list(BasicMapping().map_json(io.StringIO(lines)))
+        assert items[5].verb_id == "v5"
+        assert items[5].unused == [1, {"x": "]"}]
+
+    def test_malformed_array(self):
+        from datamapping.jsonstream import iter_json
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json(io.StringIO('[{"a": 1}, {"a": }]'), format="array"))
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json(io.StringIO('[{"a": 1}, {"a": 2'), format="array"))
+        for malformed in ['[1 2]', '[,,1,]', '[{"a":1}{"a":2}]', '[1,]', '[,1]', '[1,,2]', '[,]', '', '  \n ',
+                          '[1]garbage', '[1] \n ]']:
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json(io.StringIO(malformed), format="array", chunk_size=2))
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json(io.StringIO('{"a": 1}\n{"a": 1} junk\n'), format="ndjson"))
+        assert list(iter_json(io.StringIO('{"a": 1} \n\n[2]\t\n'), format="ndjson")) == [{"a": 1}, [2]]
+        for valid in ['[]', ' [ 1 , 2 ] ', '[{"a": [1, 2]}, "b"]', '[3.5, -1e10, true,null]']:
+            for chunk_size in (1, 2, 3):
+                assert list(iter_json(io.StringIO(valid), format="array", chunk_size=chunk_size)) == json.loads(valid)
+
+
+class TestPathTrie(TestCase):
+    def test_shared_prefix_is_descended_once(self):
+        reads = []
+
+        class CountingDict(dict):
+            def __getitem__(self, key):
+                reads.append(key)
+                return super().__getitem__(key)
+
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            special_case = [FieldMapping(RootData.id, path="special_case.nested.an_id"),
+                            FieldMapping(RootData.verb_id, path="special_case.nested.a_string")]
+
+        nested = CountingDict(an_id="MyImportantID", a_string="MyString")
+        item = BasicMapping().map_item(dict(special_case=CountingDict(nested=nested)))
+        assert (item.id, item.verb_id) == ("MyImportantID", "MyString")
+        assert reads == ["nested", "an_id", "a_string"]
+
+    def test_list_index_and_wildcard(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            lines = [FieldMapping(RootData.id, path="lines.0.sku"),
+                     FieldMapping(RootData.add_something, path="lines.*.sku")]
+
+        item = BasicMapping().map_item(dict(lines=[dict(sku="a"), dict(sku="b"), dict(sku="c")]))
+        assert item.id == "a"
+        assert item.somethings_deep == ["a", "b", "c"]
+
+    def test_missing_subtree_is_reported_once(self):
+        class BasicMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+            special_case = [FieldMapping(RootData.id, path="special_case.nested.an_id"),
+                            FieldMapping("some_string", path="special_case.nested.a_string")]
+
+        with self.assertLogs("datamapping", level="WARNING") as logs:
+            item = BasicMapping().map_item(simple_row)
+        assert len(logs.records) == 1
+        assert "special_case.nested.an_id, special_case.nested.a_string" in logs.output[0]
+        assert item.id is None
+        assert item.verb_id == "TestRow"
+
+
+class TestConverterCache(TestCase):
+    def test_lru_counts_and_evicts(self):
+        from datamapping import LRU
+        calls = []
+
+        def code(value):
+            calls.append(value)
+            return value.upper()
+
+        class CodeMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=code, cache=LRU(2))
+
+        items = CodeMapping().map_all(dict(id=value) for value in ["a", "b", "a", "c", "a", "b"])
+        assert [item.id for item in items] == ["A", "B", "A", "C", "A", "B"]
+        assert calls == ["a", "b", "c", "b"]
+        cache = CodeMapping.id.cache
+        assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
+
+    def test_pure_converter_shares_cache(self):
+        from datamapping import pure
+        calls = []
+
+        @pure
+        def code(value, key):
+            calls.append(value)
+            return value.upper()
+
+        class OneMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=code)
+
+        class OtherMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=code)
+
+        OneMapping().map_item(dict(id="x"))
+        assert OtherMapping().map_item(dict(id="x")).id == "X"
+        assert calls == ["x"]
+        assert code.converter_cache.hits == 1
+
+    def test_per_batch_cache_clears(self):
+        calls = []
+
+        def code(value):
+            calls.append(value)
+            return value
+
+        class CodeMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=code, cache="per-batch")
+
+        mapping = CodeMapping()
+        mapping.map_all([dict(id="a"), dict(id="a")])
+        mapping.map_all([dict(id="a")])
+        assert calls == ["a", "a"]
+        # Records mapped one at a time stay in one batch, bounded by maxsize.
+        for i in range(5000):
+            mapping.map_item(dict(id=str(i)))
+        assert len(CodeMapping.id.cache) == CodeMapping.id.cache.maxsize == 4096
+
+    def test_embedded_items_are_cached(self):
+        from datamapping import LRU
+
+        class DeeperMapping(SourceMapping):
+            target_collection = Deeper
+            info = MapTo(Deeper.info)
+
+        class ParentMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            deep = FieldMapping(RootData.add_something, DeeperMapping, cache=LRU(10))
+
+        items = ParentMapping().map_all(dict(id=str(i), deep=dict(info="same")) for i in range(3))
+        assert items[0].somethings_deep[0] is items[2].somethings_deep[0]
+        assert ParentMapping.deep.cache.stats()["hits"] == 2
+
+    def test_unhashable_values_are_not_cached(self):
+        from datamapping import LRU
+
+        class CodeMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=lambda value: len(value), cache=LRU())
+
+        assert CodeMapping().map_item(dict(id=[{1}, {2}])).id == 2
+        assert CodeMapping.id.cache.uncacheable == 1
+
+
+async def find_code(value):
+    # Stands in for a lookup service.
+    await asyncio.sleep(0.05)
+    return value.upper()
+
+
+class AsyncMapping(SourceMapping):
+    target_collection = RootData
+    id = MapTo(converter=find_code)
+    verb_id = MapTo(converter=upper_case)
+
+
+class TestAsyncMapping(TestCase):
+    def test_amap_item(self):
+        item = asyncio.run(AsyncMapping().amap_item(dict(id="a", verb_id="b")))
+        assert (item.id, item.verb_id) == ("A", "B")
+
+    def test_amap_many_awaits_concurrently(self):
+        async def collect():
+            rows = [dict(id=str(i), verb_id="v") for i in range(20)]
+            return [item async for item in AsyncMapping().amap_many(rows, concurrency=10)]
+
+        start = time.perf_counter()
+        items = asyncio.run(collect())
+        assert time.perf_counter() - start < 0.5
+        assert [item.id for item in items] == [str(i) for i in range(20)]
+
+    def test_amap_many_completes_after_await(self):
+        from datamapping import IgnoreEntry
+        completed = []
+
+        async def only_even(value):
+            await asyncio.sleep(0)
+            if int(value) % 2:
+                raise IgnoreEntry()
+            return value
+
+        class CompletingMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=only_even)
+
+            def mapping_complete(self, item=None):
+                completed.append(item.id)
+
+        async def collect():
+            return [item async for item in CompletingMapping().amap_many(dict(id=str(i)) for i in range(5))]
+
+        assert [item.id for item in asyncio.run(collect())] == ["0", "2", "4"]
+        assert completed == ["0", "2", "4"]
+
+    def test_sync_mapping_rejects_coroutine_converters(self):
+        with self.assertRaises(MappingError):
+            AsyncMapping().map_item(dict(id="a"))
+
+
+class TestBatchConverter(TestCase):
+    def test_map_many_resolves_keys_in_batches(self):
+        from datamapping import batched
+        calls = []
+
+        @batched(batch_size=4)
+        def find_codes(keys):
+            calls.append(keys)
+            return {key: key.upper() for key in keys if key != "x"}
+
+        class CodeMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=find_codes)
+
+        rows = [dict(id=value) for value in "abaxcdaeb"]
+        items = CodeMapping().map_all(rows)
+        assert [item.id for item in items] == ["A", "B", "A", None, "C", "D", "A", "E", "B"]
+        assert calls == [["a", "b", "x"], ["c", "d", "a", "e"], ["b"]]
+
+    def test_deferred_values_land_on_context_items(self):
+        from datamapping import batched
+        completed = []
+
+        @batched
+        def find_verbs(keys):
+            return [key * 2 for key in keys]
+
+        class DeeperMapping(SourceMapping):
+            target_collection = Deeper
+            info = MapTo(Deeper.info)
+            verb = FieldMapping(RootData.verb_id, find_verbs)
+
+        class ParentMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            deep = FieldMapping(RootData.add_something, DeeperMapping)
+
+            def mapping_complete(self, item=None):
+                completed.append(item.verb_id)
+
+        items = ParentMapping().map_all(dict(id=str(i), deep=dict(info="i", verb=str(i))) for i in range(3))
+        assert [item.verb_id for item in items] == ["00", "11", "22"]
+        assert completed == ["00", "11", "22"]
+
+    def test_map_item_resolves_single_key(self):
+        from datamapping import BatchConverter
+
+        class CodeMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=BatchConverter(lambda keys: {key: len(key) for key in keys}))
+
+        assert CodeMapping().map_item(dict(id="abc")).id == 3
+
+    def test_batched_mapping_rejects_coroutine_converters(self):
+        import warnings
+        from datamapping import batched
+
+        class MixedMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=find_code)
+            verb_id = MapTo(converter=batched(lambda keys: keys))
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            with self.assertRaisesRegex(MappingError, "amap_item or amap_many"):
+                MixedMapping().map_all([dict(id="a", verb_id="b")])
+        item = asyncio.run(MixedMapping().amap_item(dict(id="a", verb_id="b")))
+        assert (item.id, item.verb_id) == ("A", "b")
+
+
+class TestSinks(TestCase):
+    rows = [dict(id=str(i), verb_id="v") for i in range(7)]
+
+    def test_memory_sink_flushes_in_batches(self):
+        from datamapping import MemorySink
+        with MemorySink(flush_size=3) as sink:
+            assert ParallelMapping().map_many(self.rows, sink=sink) is sink
+        assert [item.verb_id for item in sink.items[RootData]] == ["V"] * 7
+        assert (sink.written, sink.saved, sink.flushes) == (7, 7, 3)
+
+    def test_failed_items_do_not_lose_the_batch(self):
+        from datamapping import BulkSink
+        saved = []
+
+        def save_many(item_type, items):
+            if any(item.id == "3" for item in items):
+                raise ValueError("duplicate key")
+            saved.extend(item.id for item in items)
+
+        class IdMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+
+        with BulkSink(save_many, flush_size=4) as sink:
+            IdMapping().map_many(self.rows, sink=sink)
+        assert sorted(saved) == ["0", "1", "2", "4", "5", "6"]
+        assert [error.items[0].id for error in sink.errors] == ["3"]
+
+    def test_sqlite_sink(self):
+        import sqlite3
+        from datamapping import SQLiteSink
+        connection = sqlite3.connect(":memory:", check_same_thread=False)
+        with SQLiteSink(connection, flush_size=5) as sink:
+            ParallelMapping().map_many(self.rows, sink=sink)
+        rows = connection.execute('SELECT verb_id, somethings_deep FROM "rootdata"').fetchall()
+        assert rows == [("V", "[]")] * 7
+
+    def test_consume_closes_the_sink(self):
+        import sqlite3
+        from datamapping import MemorySink, SQLiteSink
+
+        def failing(value, key):
+            if value == "3":
+                raise ValueError("bad row")
+            return value
+
+        class FailingMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=failing)
+
+        threads = threading.active_count()
+        for _ in range(3):
+            MemorySink(flush_size=2).consume(ParallelMapping().map_many(self.rows))
+        assert threading.active_count() == threads
+        sink = MemorySink(flush_size=2)
+        with self.assertRaises(MappingError):
+            FailingMapping().map_many([dict(id=str(i)) for i in range(7)], sink=sink)
+        assert [item.id for item in sink.items[RootData]] == ["0", "1", "2"]
+        assert threading.active_count() == threads
+        with tempfile.TemporaryDirectory() as directory:
+            database = os.path.join(directory, "items.db")
+            sink = SQLiteSink(database, flush_size=5)
+            ParallelMapping().map_many(self.rows, sink=sink)
+            assert sink._connection is None and threading.active_count() == threads
+            ParallelMapping().map_many(self.rows, sink=sink)
+            sink.close()
+            with sqlite3.connect(database) as connection:
+                assert connection.execute('SELECT COUNT(*) FROM "rootdata"').fetchone() == (14,)
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        from datamapping.registry import MappingRegistry
+        self.registry = MappingRegistry()
+
+    def test_locate_resolves_through_mro(self):
+        class Source(object): ...
+
+        class SpecialSource(Source): ...
+
+        self.registry.register(ParallelMapping, source=Source)
+        assert self.registry.locate(SpecialSource()) is ParallelMapping
+        with self.assertRaises(NotImplementedError):
+            self.registry.locate(int)
+        # Registering clears the resolved types, including the misses.
+        self.registry.register(DeepListMapping, source=int)
+        assert self.registry.locate(3) is DeepListMapping
+
+    def test_maps_registers(self):
+        from datamapping import maps, locate
+
+        class Source(object): ...
+
+        @maps(to=RootData, source=Source)
+        class SourceDataMapping(SourceMapping):
+            id = MapTo()
+
+        assert locate(Source) is SourceDataMapping
+        assert SourceDataMapping.target_collection is RootData
+
+    def test_maps_without_target(self):
+        from datamapping import maps
+
+        @maps(kind="untargeted")
+        class UntargetedMapping(SourceMapping):
+            id = MapTo()
+
+        assert UntargetedMapping.target_collection is None
+        with self.assertRaisesRegex(MappingError, "data factory can only be None"):
+            UntargetedMapping().map_item(dict(id="1"))
+
+    def test_route_by_discriminator(self):
+        class IdMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+
+        class InfoMapping(SourceMapping):
+            target_collection = Deeper
+            info = MapTo(Deeper.info)
+
+        self.registry.register(IdMapping, kind="root")
+        self.registry.register(InfoMapping, kind="deeper")
+        records = [dict(type="root", id="1"), dict(type="deeper", info="a"), dict(type="root", id="2")]
+        items = list(self.registry.route(records, discriminator="type", batch_size=2))
+        assert items == [RootData(id="1"), RootData(id="2"), Deeper(info="a")]
+        with self.assertRaises(NotImplementedError):
+            list(self.registry.route([dict(type="other")], discriminator="type"))
+
+
+class TestContextResolution(TestCase):
+    def test_fields_resolve_items_up_the_embedding(self):
+        class InnerMapping(SourceMapping):
+            target_collection = Deeper
+            info = MapTo(Deeper.info)
+            root_id = MapTo(RootData.verb_id)
+
+        class MiddleMapping(SourceMapping):
+            inner = FieldMapping(RootData.add_something, InnerMapping)
+
+        class OuterMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(RootData.id)
+            middle = EmbeddedValues(MiddleMapping)
+
+        plan = OuterMapping.get_plan()
+        assert plan.resolve("id")[0].own_item
+        assert not InnerMapping.get_plan().resolve("root_id")[0].own_item
+        item = OuterMapping().map_item(dict(id="1", middle=dict(inner=dict(info="i", root_id="r"))))
+        assert item.verb_id == "r"
+        assert item.somethings_deep == [Deeper(info="i")]
+
+    def test_overridden_create_data_item_resolves_per_record(self):
+        class CreatingMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(RootData.id)
+
+            def create_data_item(self, raw_data=None):
+                return RootData(verb_id="created")
+
+        assert not CreatingMapping.get_plan().resolve("id")[0].own_item
+        item = CreatingMapping().map_item(dict(id="1"))
+        assert (item.id, item.verb_id) == ("1", "created")
+
+
+class TestGenericsIntrospection(TestCase):
+    def test_identity_cached_handles_unhashable_arguments(self):
+        from datamapping._helpers.generics import identity_cached
+        calls = []
+
+        class Unhashable(object):
+            __hash__ = None
+
+        @identity_cached
+        def describe(tp):
+            calls.append(tp)
+            return type(tp).__name__
+
+        alias = Unhashable()
+        assert describe(alias) == describe(alias) == "Unhashable"
+        assert describe(Unhashable()) == "Unhashable"
+        assert len(calls) == 2
+
+    def test_instanceof_generic_contexts(self):
+        from typing import Generic, TypeVar
+        T = TypeVar("T", bound=str)
+
+        class Node(Generic[T]):
+            pass
+
+        assert SourceMapping.instanceof(Node[str](), Node[str])
+        assert not SourceMapping.instanceof(Node[int](), Node[str])
+        assert SourceMapping.instanceof([], List[object])
+        assert SourceMapping.instanceof("a", str)
+
+
+class TestLineage(TestCase):
+    def test_lineage_is_recorded_beside_values(self):
+        from datamapping import LineageStore
+        lineage = LineageStore()
+
+        class DeeperMapping(SourceMapping):
+            target_collection = Deeper
+            info = MapTo(Deeper.info)
+
+        class LineageMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo(converter=upper_case)
+            special_case = FieldMapping(RootData.id, path="special_case.an_id")
+            deep = FieldMapping(RootData.add_something, DeeperMapping)
+
+        mapping = LineageMapping(lineage=lineage)
+        items = mapping.map_all([dict(simple_row, deep=dict(info="a")), dict(simple_row, deep=dict(info="b"))])
+        assert items[0].verb_id == "TESTROW"
+        assert lineage.of(items[0], "id").path == "special_case.an_id"
+        verb = lineage.of(items[1], "verb_id")
+        assert (verb.path, verb.method, verb.docstring) == ("verb_id", "upper_case", [""])
+        assert lineage.of(items[1].somethings_deep[0], "info").path == "deep.info"
+        # Provenance is recorded once per field and path, not per value.
+        assert len(lineage.provenances) == 4
+        assert len(lineage) == 4
+
+    def test_lineage_of_freed_items_is_forgotten(self):
+        import gc
+        from datamapping import LineageStore
+        lineage = LineageStore()
+        mapping = ParallelMapping(lineage=lineage)
+        for row in [simple_row] * 5:
+            mapping.map_item(row)
+        gc.collect()
+        assert len(lineage) == 0
+        item = mapping.map_item(simple_row)
+        assert len(lineage) == 1 and lineage.of(item, "id").path == "special_case.an_id"
+        assert lineage.of(RootData(), "id") is None and lineage.lineage(RootData()) == {}
+
+    def test_lineage_mappings_run_in_parallel(self):
+        from datamapping import LineageStore
+        lineage = LineageStore()
+        items = ParallelMapping(lineage=lineage).map_all([simple_row])
+        copied = pickle.loads(pickle.dumps(lineage))
+        assert len(copied) == 0 and copied.of(items[0], "id") is None
+        items = list(ParallelMapping(lineage=lineage).map_parallel(TestMapParallel.rows[:4], workers=2))
+        assert [item.id for item in items] == ["0", "1", "2", "3"]
+
+
+class TestSlots(TestCase):
+    def test_core_objects_are_slotted(self):
+        from datamapping.mappable import MappingInfo
+        assert not hasattr(MapTo(), "__dict__")
+        # Unknown attributes of a MappingInfo, __dict__ included, come from the field's type.
+        assert MappingInfo.__dictoffset__ == 0
+
+    def test_annotated_value_keeps_prefixed_annotations(self):
+        from datamapping.source import AnnotatedValue
+        value = AnnotatedValue("v")
+        value.path = "a.b"
+        value.Extra = 1
+        assert getattr(value, "@path") == "a.b"
+        assert value.annotations == {"@path": "a.b", "@Extra": 1}
+        assert value == AnnotatedValue("v")
+        with self.assertRaises(AttributeError):
+            getattr(value, "@MethodExecuted")
+
+    def test_annotated_value_keeps_its_dataclass_api(self):
+        from dataclasses import is_dataclass, asdict
+        from datamapping.source import AnnotatedValue
+        value = AnnotatedValue("v")
+        value.path = "a.b"
+        value.Extra = 1
+        assert is_dataclass(value) and asdict(value) == {"value": "v"}
+        assert vars(value) == {"value": "v", "@path": "a.b", "@Extra": 1}
+
+    def test_memory_benchmark_compares_layouts(self):
+        from benchmarks.memory import main
+        results = main(200)
+        assert results["AnnotatedValue bytes"]["saved"] > 0
+        assert results["MappingInfo bytes"]["saved"] > 0
+
+    def test_annotated_value_pickles(self):
+        import copy
+        from datamapping.source import AnnotatedValue
+        value = AnnotatedValue("v")
+        value.path = "a.b"
+        value.Extra = 1
+        for copied in (pickle.loads(pickle.dumps(value)), copy.deepcopy(value)):
+            assert copied.value == "v"
+            assert copied.annotations == {"@path": "a.b", "@Extra": 1}
+        items = list(ParallelMapping(should_annotate=True).map_parallel(TestMapParallel.rows[:4], workers=2))
+        assert getattr(items[0].verb_id, "@path") == "verb_id"
+
+
+class TestEncoding(TestCase):
+    def test_bytes_values_are_decoded(self):
+        item = ParallelMapping().map_item(dict(verb_id="café".encode("utf-8"), other="café".encode("cp1252")))
+        assert item.verb_id == "CAFÉ"
+        assert item.other == "café"
+
+    def test_detect_encoding(self):
+        from datamapping.encoding import detect_encoding
+        assert detect_encoding(b"plain") == "utf-8"
+        # A sample can end in the middle of a character.
+        assert detect_encoding("naïve".encode("utf-8")[:3]) == "utf-8"
+        assert detect_encoding("naïve".encode("cp1252")) == "cp1252"
+        assert detect_encoding(b"\xef\xbb\xbfid") == "utf-8-sig"
+
+    def test_map_csv_binary_source_falls_back_to_cp1252(self):
+        class CsvMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            verb_id = MapTo()
+
+        data = b"\xef\xbb\xbfid,verb_id\n1,caf\xc3\xa9\n2,caf\xe9\n"
+        items = list(CsvMapping().map_csv(io.BytesIO(data), encoding="auto"))
+        assert [(item.id, item.verb_id) for item in items] == [("1", "café"), ("2", "café")]
+
+
+class TestProfiler(TestCase):
+    def test_profiler_reports_per_field(self):
+        from datamapping import Profiler
+        reports = []
+        profiler = Profiler(callback=reports.append, every=2)
+        rows = [simple_row, dict(verb_id="v", special_case=dict()), dict(deep=[dict(info="a"), dict(info="b")])]
+        mapping = ConcurrentMapping(profiler=profiler)
+        mapping.map_all([dict(id="a", deep=[dict(info="i")])])
+        ParallelMapping(profiler=profiler).map_all(rows)
+        report = profiler.report()
+        parallel = report[f"{__name__}.ParallelMapping"]
+        assert parallel["verb_id"]["calls"] == 2
+        assert parallel["verb_id"]["convert_p50"] is not None
+        assert parallel["special_case.an_id"]["path_misses"] == 1
+        concurrent = report[f"{__name__}.ConcurrentMapping"]
+        assert concurrent["deep"]["calls"] == 1 and concurrent["deep"]["embedded_time"] > 0
+        assert report[f"{__name__}.DeepListMapping"]["info"]["calls"] == 1
+        assert profiler.records == 4 and len(reports) == 2
+        assert json.loads(profiler.to_json())["records"] == 4
+
+    def test_profiled_mappings_run_in_parallel(self):
+        from datamapping import Profiler
+        profiler = Profiler(every=5)
+        ParallelMapping(profiler=profiler).map_all([simple_row])
+        copied = pickle.loads(pickle.dumps(profiler))
+        assert copied.every == 5 and copied.records == 0 and copied.report() == {}
+        items = list(ParallelMapping(profiler=profiler).map_parallel(TestMapParallel.rows[:4], workers=2))
+        assert [item.id for item in items] == ["0", "1", "2", "3"]
+
+
+class TestFilters(TestCase):
+    def test_records_are_rejected_before_item_creation(self):
+        from datamapping import KeepIf, IgnoreEntry
+        created = []
+
+        class FilteredDeepMapping(ListMapper):
+            target_collection = Deeper
+            info = MapTo(Deeper.info)
+            not_skipped = KeepIf("info", lambda info: info != "skip")
+
+        class FilteredMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo()
+            deep = FieldMapping(RootData.add_something, FilteredDeepMapping)
+            an_id = KeepIf("special_case.an_id", lambda an_id: an_id.startswith("My"))
+            verbs = KeepIf("verb_id", lambda verb_id: verb_id != "drop", keep_missing=True)
+
+            def create_data_item(self, raw_data=None):
+                created.append(raw_data)
+                return RootData()
+
+        rows = [dict(simple_row, deep=[dict(info="a"), dict(info="skip")]), dict(simple_row, verb_id="drop"),
+                dict(Special_Case=dict(an_id="Other")), dict(verb_id="no special case")]
+        mapping = FilteredMapping()
+        items = mapping.map_all(rows)
+        assert [item.verb_id for item in items] == ["TestRow"]
+        assert [deep.info for deep in items[0].somethings_deep] == ["a"]
+        assert len(created) == 1
+        assert mapping.rejected == dict(an_id=2, verbs=1)
+        assert FilteredDeepMapping().rejected == {}
+        with self.assertRaises(IgnoreEntry):
+            mapping.map_item(rows[1])
+        headings = ["verb_id", "special_case"]
+        assert len(mapping.map_all([["drop", dict(an_id="My")], ["keep", dict(an_id="My")]], headings)) == 1
+
+    def test_filtered_columns_are_read_from_files(self):
+        from datamapping import KeepIf
+
+        class FilteredCsvMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            wanted = KeepIf("status", lambda status: status == "open")
+
+            @property
+            def store_unmapped(self):
+                return False
+
+        data = b"id,Status\n1,open\n2,closed\n"
+        mapping = FilteredCsvMapping()
+        assert [item.id for item in mapping.map_csv(io.BytesIO(data))] == ["1"]
+        assert mapping.rejected["wanted"] == 1
+
+    def test_missing_filter_paths_are_not_logged(self):
+        from datamapping import KeepIf
+
+        class NestedFilterMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            abroad = KeepIf("address.country", lambda country: country != "US")
+
+        import logging
+        records = []
+        handler = logging.Handler()
+        handler.emit = records.append
+        logger = logging.getLogger("datamapping")
+        logger.addHandler(handler)
+        mapping = NestedFilterMapping()
+        try:
+            items = mapping.map_all([dict(id="1", address=dict(city="Paris")), dict(id="2", address=dict(country="FR"))])
+        finally:
+            logger.removeHandler(handler)
+        assert [item.id for item in items] == ["2"] and records == []
+        assert mapping.rejected == dict(abroad=1)
+
+    def test_filtered_paths_are_kept_by_json_projections(self):
+        from datamapping import KeepIf
+
+        class FilteredJsonMapping(SourceMapping):
+            target_collection = RootData
+            addr = FieldMapping(RootData.id, path="addr.city")
+            abroad = KeepIf("addr.country", lambda country: country != "US")
+            wanted = KeepIf("status", lambda status: status == "open")
+
+            @property
+            def store_unmapped(self):
+                return False
+
+        documents = [dict(status="open", addr=dict(city="Paris", country="FR")),
+                     dict(status="open", addr=dict(city="Boston", country="US")),
+                     dict(status="closed", addr=dict(city="Rome", country="IT"))]
+        mapping = FilteredJsonMapping()
+        assert [item.id for item in mapping.map_json(io.StringIO(json.dumps(documents)))] == ["Paris"]
+        assert mapping.rejected == dict(abroad=1, wanted=1)
+
+
+class TestLazy(TestCase):
+    def test_fields_are_converted_on_first_read(self):
+        from datamapping import LazyItem, MemorySink
+        converted = []
+        completed = []
+
+        def counted(value, key):
+            converted.append(value)
+            return value.upper()
+
+        class LazyMapping(SourceMapping):
+            target_collection = RootData
+            verb_id = MapTo(converter=counted)
+            special_case = FieldMapping(RootData.id, counted, path="special_case.an_id")
+            deep = FieldMapping(RootData.add_something, DeepListMapping)
+
+            def mapping_complete(self, item=None):
+                completed.append(item)
+                return item
+
+        rows = [dict(simple_row, deep=[dict(info="a")]), dict(verb_id="other")]
+        items = list(LazyMapping(lazy=True).map_many(rows))
+        assert all(type(item) is LazyItem for item in items)
+        assert items[0].verb_id == "TESTROW" and items[0].verb_id == "TESTROW"
+        assert converted == ["TestRow"] and not completed
+        # Attributes missing from the record keep the value of the mapped item.
+        assert items[1].id is None and items[1].materialized
+        assert items[0].somethings_deep[0].info == "a"
+        assert items[0].materialized and completed[-1] is items[0].materialize()
+        assert items[0].materialize().id == "MYIMPORTANTID"
+        assert type(pickle.loads(pickle.dumps(items[1]))) is RootData
+        sink = MemorySink()
+        with sink:
+            sink.write(items[1])
+        assert sink.items[RootData][0].verb_id == "OTHER"
+
+    def test_records_ignored_by_converters_raise_on_read(self):
+        from datamapping import IgnoreEntry, LazyRecordIgnored, MemorySink
+
+        def odd_only(value, key):
+            if int(value) % 2 == 0:
+                raise IgnoreEntry()
+            return value
+
+        class IgnoringMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo(converter=odd_only)
+            verb_id = MapTo()
+
+        rows = [dict(id="1", verb_id="a"), dict(id="2", verb_id="b")]
+        assert [item.id for item in IgnoringMapping().map_many(rows)] == ["1"]
+        items = list(IgnoringMapping(lazy=True).map_many(rows))
+        assert items[1].verb_id == "b"
+        with self.assertRaises(MappingError):
+            items[1].id
+        with self.assertRaises(LazyRecordIgnored):
+            items[1].materialize()
+        assert items[0].materialize().id == "1"
+        sink = IgnoringMapping(lazy=True).map_many(rows + [dict(id="3", verb_id="c")], sink=MemorySink())
+        assert [item.id for item in sink.items[RootData]] == ["1", "3"]
+
+    def test_columns_are_read_lazily(self):
+        class LazyCsvMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            verb_id = MapTo()
+
+        mapping = LazyCsvMapping(lazy=True)
+        items = list(mapping.map_csv(io.BytesIO(b"id,verb_id\n1,a\n2,b\n")))
+        assert [item.verb_id for item in items] == ["a", "b"]
+        assert not any(item.materialized for item in items)
+        items = mapping.map_all([["3", "c"]], ["id", "verb_id"])
+        assert items[0].id == "3" and items[0].materialize().verb_id == "c"
+
+
+class DetailMapping(ListMapper):
+    target_collection = Deeper
+    info = MapTo(Deeper.info)
+
+
+class TestGrouping(TestCase):
+    def test_rows_sharing_a_key_form_one_record(self):
+        from datamapping import GroupRows
+
+        class GroupedMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            verb_id = MapTo()
+            lines = FieldMapping(RootData.add_something, DetailMapping)
+            rows = GroupRows("id", details="lines", is_detail=lambda row: row["type"] == "D")
+
+        rows = [dict(id="2", type="H", verb_id="second"), dict(id="1", type="H", verb_id="first"),
+                dict(id="1", type="D", info="a"), dict(id="2", type="D", info="c"), dict(id="1", type="D", info="b")]
+        mapping = GroupedMapping()
+        for spill_size in (100, 2):
+            items = list(mapping.map_groups(rows, spill_size=spill_size))
+            assert [(item.id, item.verb_id) for item in items] == [("1", "first"), ("2", "second")]
+            assert [[deep.info for deep in item.somethings_deep] for item in items] == [["a", "b"], ["c"]]
+        presorted = [["1", "H", "first", None], ["1", "D", None, "a"], ["2", "H", "second", None]]
+        items = list(mapping.map_groups(presorted, ["id", "type", "verb_id", "info"], presorted=True))
+        assert [(item.id, len(item.somethings_deep)) for item in items] == [("1", 1), ("2", 0)]
+        with self.assertRaises(MappingError):
+            list(mapping.map_groups([dict(id=1), dict(id="1")], spill_size=1))
+        with self.assertRaises(MappingError):
+            DetailMapping().map_groups(rows)
+
+    def test_rows_without_the_key_are_rejected(self):
+        from datamapping import GroupRows
+
+        class KeyedMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            rows = GroupRows(("id", "verb_id"))
+
+        rows = [dict(id="1", verb_id="a"), dict(id="2"), dict(id="3")]
+        for presorted in (False, True):
+            with self.assertRaisesRegex(MappingError, "'verb_id'"):
+                list(KeyedMapping().map_groups(rows, presorted=presorted))
+
+
+class TestStreamedList(TestCase):
+    def test_children_are_streamed_after_their_parent(self):
+        from datamapping import StreamedList, BatchConverter, MemorySink
+        resolved = []
+
+        def lengths(keys):
+            resolved.append(len(keys))
+            return {key: len(key) for key in keys}
+
+        class StreamedDeepMapping(ListMapper):
+            target_collection = Deeper
+            info = MapTo(Deeper.info, converter=BatchConverter(lengths))
+
+        class StreamingMapping(SourceMapping):
+            target_collection = RootData
+            id = MapTo()
+            deep = StreamedList(StreamedDeepMapping, back_reference="parent", parent_key="id", chunk_size=2)
+
+        rows = [dict(deep=[dict(info="a"), dict(info="bb"), dict(info="ccc")], id="1"), dict(id="2", deep=[])]
+        items = list(StreamingMapping().map_many(rows))
+        assert [type(item) for item in items] == [RootData, Deeper, Deeper, Deeper, RootData]
+        assert items[0].somethings_deep == []
+        assert [(child.info, child.parent) for child in items[1:4]] == [(1, "1"), (2, "1"), (3, "1")]
+        # The keys of the children are resolved per chunk.
+        assert resolved == [2, 1]
+        with self.assertRaises(MappingError):
+            StreamingMapping().map_item(rows[0])
+        sink = MemorySink()
+        StreamingMapping().map_many(rows, sink=sink)
+        assert len(sink.items[Deeper]) == 3 and len(sink.items[RootData]) == 2
+
+
+@mappable(key="email")
+@dataclass
+class Owner(object):
+    email: Text = field(default=None)
+    name: Text = field(default=None)
+
+
+@mappable
+@dataclass
+class Pet(object):
+    name: Text = field(default=None)
+    owner: Owner = field(default=None)
+
+
+class OwnerMapping(SourceMapping):
+    target_collection = Owner
+    email = MapTo()
+    name = MapTo()
+
+
+class PetMapping(SourceMapping):
+    target_collection = Pet
+    name = MapTo()
+    owner = FieldMapping(Pet.owner, OwnerMapping)
+
+
+class TestIdentityMap(TestCase):
+    def test_entities_are_shared_by_natural_key(self):
+        from datamapping import IdentityMap, PER_RECORD, PER_JOB
+        rows = [dict(name="rex", owner=dict(email="a@x", name="Ann")),
+                dict(name="tom", owner=dict(email="a@x", name="Ann B.")),
+                dict(name="kit", owner=dict(email="b@x")), dict(name="ace", owner=dict(name="No email"))]
+        identity_map = IdentityMap()
+        pets = PetMapping(identity_map=identity_map).map_all(rows)
+        assert pets[0].owner is pets[1].owner and pets[1].owner.name == "Ann"
+        assert pets[2].owner is not pets[0].owner and pets[3].owner.email is None
+        assert identity_map.stats()["hits"] == 1 and len(identity_map) == 2
+        again = PetMapping(identity_map=identity_map).map_all(rows[:1])
+        assert again[0].owner is not pets[0].owner
+        pets = PetMapping(identity_map=IdentityMap(PER_RECORD)).map_all(rows[:2])
+        assert pets[0].owner is not pets[1].owner
+        identity_map = IdentityMap(PER_JOB, maxsize=1, eviction="fifo")
+        mapping = PetMapping(identity_map=identity_map)
+        first = mapping.map_all(rows[:1])[0]
+        assert mapping.map_all(rows[1:2])[0].owner is first.owner
+        mapping.map_all(rows[2:3])
+        assert mapping.map_all(rows[:1])[0].owner is not first.owner
+        with self.assertRaises(ValueError):
+            IdentityMap("per-week")
+
+
+class TestBenchmarkSuite(TestCase):
+    def test_workloads_run(self):
+        from benchmarks.suite import main
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            report = main(["--records", "20", "--output", output])
+            with open(output) as file:
+                assert json.load(file)["workloads"].keys() == report["workloads"].keys()
+        assert all(result["items"] == 20 for result in report["workloads"].values())
@@ -1,4 +1,13 @@
-from .exceptions import MappingError, BadEntryException
+from .batch import *
+from .cache import *
+from .exceptions import MappingError, BadEntryException, LazyRecordIgnored
 from .field import *
+from .filters import *
+from .grouping import GroupRows
+from .identity import *
+from .lazy import LazyItem
+from .lineage import *
 from .mappable import mappable
+from .profiling import *
+from .sinks import *
 from .source import *
@@ -1,3 +1,4 @@
+import functools
 import logging
 import sys
 import typing
@@ -13,9 +14,39 @@ __all__ = ['get_generic_type',
            'is_generic_type',
            'get_bound',
            'get_parameters',
-           'get_origin']
+           'get_origin',
+           'get_args',
+           'get_templates',
+           'identity_cached']
 
 
+def identity_cached(function):
+    """Caches the results of a function of types. Types are keyed on their identity, so aliases that can't be hashed
+    are cached as well, strings on their value. The cache holds on to the arguments, an identity can't be reused by
+    another object while its entry exists. Exceptions are not cached.
+    """
+    cache = {}
+
+    @functools.wraps(function)
+    def cached(*args):
+        if len(args) == 1:
+            arg = args[0]
+            key = arg if type(arg) is str else id(arg)
+        else:
+            key = tuple(arg if type(arg) is str else id(arg) for arg in args)
+        try:
+            return cache[key][1]
+        except KeyError:
+            pass
+        result = function(*args)
+        cache[key] = (args, result)
+        return result
+
+    cached.cache_clear = cache.clear
+    return cached
+
+
+@identity_cached
 def get_parameters(tp):
     """Return type parameters of a parameterized type as a tuple.
     """
@@ -26,7 +57,7 @@ def get_parameters(tp):
 
 
 try:
-    get_origin = typing.get_origin
+    get_origin = identity_cached(typing.get_origin)
 except:
     def get_origin(tp):
         """Get the unsubscripted version of a type. Supports generic types, Union,
@@ -39,7 +70,7 @@ except:
         return None
 
 try:
-    get_args = typing.get_args
+    get_args = identity_cached(typing.get_args)
 except:
     def get_args(tp, evaluate=None):
         """Get type arguments with all substitutions performed. For unions,
@@ -63,6 +94,7 @@ except:
         return ()
 
 
+@identity_cached
 def get_generic_bases(tp):
     """Get generic base types of a type or empty tuple if not possible.
     """
@@ -74,6 +106,7 @@ def get_generic_bases(tp):
     return a + getattr(tp, "__orig_bases__", ())
 
 
+@identity_cached
 def is_generic_type(kls):
     """Test if the given type is a generic type. This includes Generic itself, but
     excludes special typing constructs such as Union, Tuple, Callable, ClassVar.
@@ -90,8 +123,13 @@ def is_generic_type(kls):
 def resolve_type(cls, type_name, parent=None):
     if isinstance(type_name, str) and type_name[0] != "~":
         type_name = "~" + type_name
+    return _resolve_type(cls, type_name, parent)
+
+
+@identity_cached
+def _resolve_type(cls, type_name, parent):
     for base in get_generic_bases(cls):
-        res = resolve_type(base, type_name, parent=cls)
+        res = _resolve_type(base, type_name, cls)
         if res is not None and str(res) != str(type_name):
             return res
 
@@ -127,6 +165,12 @@ def get_bound(kls):
     return getattr(kls, '__bound__', None)
 
 
+@identity_cached
+def get_templates(kls):
+    """The bound, or else the constraints, of every type parameter of the origin of a generic alias."""
+    return tuple(get_bound(t) or t.__constraints__ for t in get_parameters(get_origin(kls)))
+
+
 def get_constraints(kls):
     """Returns the constraints of a `TypeVar` if any. Fails if not TypeVar"""
 
@@ -0,0 +1,114 @@
+"""Mapping with asynchronous converters.
+
+Converters that look up values in a database or a web service are declared as coroutine functions. A record is first
+mapped synchronously: plain converters run inline as usual while the coroutines of asynchronous converters are only
+created and collected on the record's :class:`~datamapping.context.MappingContext`, together with the calls to
+:meth:`~datamapping.SourceMapping.mapping_complete`. The coroutines of the record are then awaited concurrently and
+their values stored, in declaration order, before the records are completed. :func:`amap_many` keeps up to
+`concurrency` records awaiting at once and yields them in order.
+
+Values of asynchronous converters are not cached, see :mod:`datamapping.cache`. The keys of
+:class:`~datamapping.batch.BatchConverter` converters are resolved per record.
+"""
+import asyncio
+from collections import deque
+
+from .batch import resolve_pending, complete_pending
+from .context import MappingContext
+from .exceptions import MappingError
+
+__all__ = [
+    "amap_item",
+    "amap_many",
+    "DEFAULT_CONCURRENCY",
+]
+
+# Records awaiting their converters at the same time in amap_many.
+DEFAULT_CONCURRENCY = 64
+
+
+def _begin(mapping, plan, columns, raw_data, headings):
+    context = MappingContext(mapping, root=mapping.root)
+    context.pending = []
+    context.awaits = True
+    if plan.dynamic_map_item:
+        item = mapping.map_item(raw_data, headings, context)
+    else:
+        item = mapping._map_row(plan, columns if isinstance(raw_data, (list, tuple)) else None, raw_data, context)
+    return item, context.pending
+
+
+async def _complete(item, pending):
+    """Awaits the conversions of a record, stores their values and completes the record's items."""
+    from .source import IgnoreEntry
+    awaited = [(step, convert, state) for step, convert, state in pending if step is not None and step.awaitable]
+    results = await asyncio.gather(*(convert for _, convert, _ in awaited), return_exceptions=True) if awaited else ()
+    for (step, _, (header, raw_value, context)), result in zip(awaited, results):
+        if isinstance(result, (IgnoreEntry, asyncio.CancelledError)):
+            raise result
+        if isinstance(result, Exception):
+            message = context.mapping._conversion_error(header, raw_value, step.converter)
+            raise MappingError(message) from result
+    # Batched keys of a record mapped asynchronously are resolved per record.
+    return complete_pending(item, pending, resolve_pending([pending]), iter(results))
+
+
+async def amap_item(mapping, raw_data, headings=None):
+    """Maps a single record, awaiting its asynchronous converters concurrently.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` to map the record with.
+    :param raw_data: a dictionary, or a list/tuple row described by `headings`.
+    :param headings: the headings of a list/tuple row.
+    :return: the mapped item.
+    """
+    plan = mapping.get_plan()
+    item, pending = _begin(mapping, plan, plan.bind(headings or ()), raw_data, headings)
+    return await _complete(item, pending)
+
+
+async def _iterate(rows):
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+async def amap_many(mapping, rows, headings=None, concurrency=DEFAULT_CONCURRENCY):
+    """Maps rows, with up to `concurrency` records awaiting their asynchronous converters at once. Like
+    :meth:`~datamapping.SourceMapping.map_many`, rows raising :class:`~datamapping.IgnoreEntry` are skipped.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` to map the rows with.
+    :param rows: iterable or asynchronous iterable of dictionaries or of list/tuple rows.
+    :param headings: the headings of list/tuple rows.
+    :param concurrency: maximum number of records in flight.
+    :return: asynchronous generator of mapped items, in the order of the rows.
+    """
+    from .source import IgnoreEntry
+    plan = mapping.get_plan()
+    plan.begin_batch()
+    columns = plan.bind(headings or ())
+    in_flight = deque()
+    try:
+        async for row in _iterate(rows):
+            try:
+                item, pending = _begin(mapping, plan, columns, row, headings)
+            except IgnoreEntry:
+                continue
+            in_flight.append(asyncio.ensure_future(_complete(item, pending)))
+            while len(in_flight) >= concurrency:
+                try:
+                    item = await in_flight.popleft()
+                except IgnoreEntry:
+                    continue
+                yield item
+        while in_flight:
+            try:
+                item = await in_flight.popleft()
+            except IgnoreEntry:
+                continue
+            yield item
+    finally:
+        for task in in_flight:
+            task.cancel()
@@ -0,0 +1,151 @@
+"""Batched lookup converters.
+
+A converter resolving references (an owner id to a book, a code to a lookup row) is called once per value, mapping
+100k rows makes 100k lookups. A :class:`BatchConverter` resolves a whole batch of keys in one call instead::
+
+    @batched(batch_size=1000)
+    def find_books(ids):
+        return {book.id: book for book in Book.objects.filter(id__in=ids)}
+
+    class OrderMapping(SourceMapping):
+        book_id = MapTo(Order.book, converter=find_books)
+
+:meth:`~datamapping.SourceMapping.map_many` maps the rows of a chunk with the storing of batched values deferred on the
+records' :class:`~datamapping.context.MappingContext`, like the mapping of asynchronous converters. The distinct keys of
+the chunk are then resolved, the values stored on the items their contexts resolve and the records completed. A record
+mapped on its own resolves its keys one at a time.
+"""
+from collections.abc import Mapping
+
+from .context import MappingContext
+from .exceptions import MappingError
+from .parallel import chunked
+
+__all__ = [
+    "BatchConverter",
+    "batched",
+    "DEFAULT_BATCH_SIZE",
+]
+
+# Maximum number of keys resolved in one call.
+DEFAULT_BATCH_SIZE = 500
+
+
+class BatchConverter(object):
+    """A converter resolving many keys in one call.
+
+    :param resolve: callable taking a list of distinct keys, returning a mapping of key to value or a sequence of
+        values in the order of the keys.
+    :param batch_size: maximum number of keys resolved in one call.
+    :param default: the value of keys `resolve` does not answer.
+    """
+
+    def __init__(self, resolve, batch_size=DEFAULT_BATCH_SIZE, default=None):
+        self.resolve = resolve
+        self.batch_size = batch_size
+        self.default = default
+        self.__name__ = getattr(resolve, "__name__", type(resolve).__name__)
+        self.__doc__ = resolve.__doc__
+
+    def __call__(self, value):
+        return self.resolve_many([value])[value]
+
+    def resolve_many(self, keys):
+        """Resolves distinct keys, in calls of at most `batch_size` keys.
+
+        :return: dictionary of key to value.
+        """
+        resolved = {}
+        for chunk in chunked(keys, self.batch_size):
+            try:
+                values = self.resolve(chunk)
+            except Exception as ex:
+                raise MappingError(f"Error while resolving {len(chunk)} keys using {self.__name__}") from ex
+            if not isinstance(values, Mapping):
+                values = dict(zip(chunk, values))
+            for key in chunk:
+                resolved[key] = values.get(key, self.default)
+        return resolved
+
+    def __repr__(self):
+        return f"BatchConverter({self.__name__}, batch_size={self.batch_size})"
+
+
+def batched(resolve=None, *, batch_size=DEFAULT_BATCH_SIZE, default=None):
+    """Declares a :class:`BatchConverter`, usable with or without arguments."""
+
+    def declare(resolve):
+        return BatchConverter(resolve, batch_size=batch_size, default=default)
+
+    if resolve is None:
+        return declare
+    return declare(resolve)
+
+
+def resolve_pending(pendings):
+    """Resolves the batched keys collected while mapping records.
+
+    :param pendings: the pending lists of the records.
+    :return: dictionary of :class:`BatchConverter` to its dictionary of key to value.
+    """
+    keys = {}
+    for pending in pendings:
+        for step, key, _ in pending:
+            if step is not None and step.batched:
+                try:
+                    keys.setdefault(step.converter, {})[key] = None
+                except TypeError as ex:
+                    raise MappingError(f"{key!r} can not be resolved by {step.converter}, it is not hashable") from ex
+    return {converter: converter.resolve_many(list(converter_keys)) for converter, converter_keys in keys.items()}
+
+
+def complete_pending(item, pending, resolved, awaited=()):
+    """Stores the deferred values of a record, in the order they were mapped, and completes its items.
+
+    :param item: the item of the record.
+    :param pending: the pending list of the record.
+    :param resolved: the resolved keys, see :func:`resolve_pending`.
+    :param awaited: iterator of the results of the awaited conversions, in order.
+    :return: `item`.
+    """
+    for step, value, state in pending:
+        if step is None:
+            # mapping_complete of the record or of one of its embedded records.
+            value(item=state)
+            continue
+        _, _, context = state
+        if step.batched:
+            value = resolved[step.converter][value]
+        else:
+            value = next(awaited)
+        context.mapping._store_value(step, value, context)
+    return item
+
+
+def map_batched(mapping, map_record, rows, batch_size):
+    """Maps rows in chunks of `batch_size` records, resolving the batched keys of a chunk together.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` mapping the rows.
+    :param map_record: callable taking a row and the record's context, returning the item.
+    :return: generator of mapped items, rows raising :class:`~datamapping.IgnoreEntry` are skipped.
+    """
+    from .source import IgnoreEntry
+    from .streaming import stream_children
+    streams = mapping.get_plan().streams
+    for chunk in chunked(rows, batch_size):
+        records = []
+        for row in chunk:
+            context = MappingContext(mapping, root=mapping.root)
+            context.pending = []
+            if streams:
+                context.streams = []
+            try:
+                records.append((map_record(row, context), context.pending, context.streams))
+            except IgnoreEntry:
+                continue
+        resolved = resolve_pending(pending for _, pending, _ in records)
+        for item, pending, record_streams in records:
+            yield complete_pending(item, pending, resolved)
+            if record_streams:
+                # Streamed lists are mapped once their parent is complete.
+                yield from stream_children(record_streams)
@@ -0,0 +1,195 @@
+"""Memoization of pure converters.
+
+Feeds repeat the same codes, ids and status strings millions of times, a converter declared pure only has to run once
+per distinct ``(value, key)``. A cache policy is given to a field mapping with ``FieldMapping(..., cache=LRU(1000))`` or
+``cache="per-batch"``, or to the converter itself with :func:`pure` so that every mapping class using the converter
+shares one cache::
+
+    @pure(cache=LRU(10000))
+    def find_book(value):
+        ...
+
+Values that can't be hashed (dictionaries and lists handed to embedded mappings) are frozen into tuples to build the
+key, values that can't be frozen either are converted without the cache.
+"""
+import threading
+from collections import OrderedDict
+
+__all__ = [
+    "ConverterCache",
+    "LRU",
+    "PerBatch",
+    "PER_BATCH",
+    "pure",
+    "make_cache",
+    "CachedConverterCall",
+]
+
+PER_BATCH = "per-batch"
+
+# Default size of the cache attached by @pure.
+DEFAULT_MAXSIZE = 4096
+
+_MISS = object()
+_FROZEN = object()
+
+
+class ConverterCache(object):
+    """A thread safe cache of converted values, evicting the least recently used entry past `maxsize`.
+
+    :param maxsize: maximum number of entries, None for unbounded.
+    :ivar hits: lookups answered from the cache.
+    :ivar misses: lookups that ran the converter.
+    :ivar evictions: entries dropped to stay within `maxsize`.
+    :ivar uncacheable: values converted without the cache because no key could be built for them.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncacheable = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+    def count_uncacheable(self):
+        with self._lock:
+            self.uncacheable += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def begin_batch(self):
+        """Called when a batch of rows starts, see :meth:`datamapping.SourceMapping.map_many`."""
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, uncacheable=self.uncacheable,
+                    size=len(self), maxsize=self.maxsize)
+
+    def __getstate__(self):
+        # Caches travel empty, e.g. to worker processes.
+        return dict(maxsize=self.maxsize)
+
+    def __setstate__(self, state):
+        ConverterCache.__init__(self, state["maxsize"])
+
+    def __repr__(self):
+        return f"{type(self).__name__}(maxsize={self.maxsize})"
+
+
+class LRU(ConverterCache):
+    """A cache holding the `maxsize` most recently used values."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        super().__init__(maxsize)
+
+
+class PerBatch(ConverterCache):
+    """A cache emptied whenever a new batch of rows starts, values are never reused across batches. Only the bulk APIs
+    (``map_many``, ``map_columns``, ``amap_many`` and those built on them) start batches, records mapped one at a time
+    by ``map_item`` share a single batch; past `maxsize` entries the least recently used is dropped.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        super().__init__(maxsize)
+
+    def begin_batch(self):
+        self.clear()
+
+
+def make_cache(policy):
+    """Resolves a cache policy: None, a :class:`ConverterCache`, :data:`PER_BATCH` or a maximum size for an
+    :class:`LRU`.
+    """
+    if policy is None or isinstance(policy, ConverterCache):
+        return policy
+    if policy == PER_BATCH:
+        return PerBatch()
+    if isinstance(policy, int) and not isinstance(policy, bool):
+        return LRU(policy)
+    raise ValueError(f"Unknown cache policy {policy!r}")
+
+
+def pure(converter=None, *, cache=None):
+    """Declares a converter pure, its result only depends on its value and key. Every field mapping using the converter
+    without a cache policy of its own shares `cache`, an :class:`LRU` by default.
+    """
+
+    def declare(converter):
+        converter.converter_cache = make_cache(cache) or LRU()
+        return converter
+
+    if converter is None:
+        return declare
+    return declare(converter)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+class CachedConverterCall(object):
+    """Converter call shape consulting a cache before calling the converter.
+
+    :param call: the call shape of the converter, taking the value.
+    :param cache: the :class:`ConverterCache`.
+    :param owner: the converter, part of the key so converters can share a cache.
+    :param key: the key the converter is called with, None when the converter does not take one.
+    """
+    __slots__ = ("call", "cache", "owner", "key")
+
+    def __init__(self, call, cache, owner, key=None):
+        self.call = call
+        self.cache = cache
+        self.owner = owner
+        self.key = key
+
+    def __call__(self, value):
+        return self.call_with(self.call, value)
+
+    def call_with(self, call, value, *args):
+        """Answers from the cache or converts the value with ``call(value, *args)``."""
+        try:
+            cache_key = (self.owner, value, self.key)
+            hash(cache_key)
+        except TypeError:
+            try:
+                cache_key = (self.owner, _FROZEN, _freeze(value), self.key)
+            except TypeError:
+                self.cache.count_uncacheable()
+                return call(value, *args)
+        result = self.cache.get(cache_key, _MISS)
+        if result is _MISS:
+            result = call(value, *args)
+            self.cache.put(cache_key, result)
+        return result
@@ -0,0 +1,121 @@
+"""Per record mapping state.
+
+Mapping instances only hold configuration, everything that changes while a record is mapped lives on a
+:class:`MappingContext`. A context is created for every record and for every embedded mapping inside a record, so a
+single mapping instance can be used from many threads, or recursively, at the same time.
+"""
+
+__all__ = ["MappingContext"]
+
+
+class _Empty(object): ...
+
+
+class MappingContext(object):
+    """State of one mapping while it maps one record.
+
+    :ivar mapping: The :class:`~datamapping.SourceMapping` mapping the record.
+    :ivar parent: Context of the embedding mapping, None for the top level record.
+    :ivar root: Heading the embedded record was found under, or the root of a top level mapping.
+    :ivar item: The item the record is mapped into.
+    :ivar items: Items and values created while mapping the record, by type, used to resolve field contexts.
+    :ivar annotate: Whether values are annotated, inherited from the top level mapping.
+    :ivar lineage: The :class:`~datamapping.lineage.LineageStore` provenance is recorded in, inherited from the top
+        level mapping.
+    :ivar profiler: The :class:`~datamapping.profiling.Profiler` timing the fields, inherited from the top level
+        mapping.
+    :ivar identity_map: The :class:`~datamapping.identity.IdentityMap` deduplicating stored entities, inherited from
+        the top level mapping.
+    :ivar pending: List collecting the conversions to await and the completions to run afterwards when the record is
+        mapped asynchronously or by batches, None otherwise. Shared by every context of the record.
+    :ivar awaits: Whether the record is mapped by the asynchronous APIs, which await the coroutines of `pending`.
+    :ivar streams: List collecting the lists of the record streamed by :class:`~datamapping.field.StreamedList`
+        fields, mapped once the record is. None when the record is not mapped by a bulk API. Shared by every context of
+        the record.
+    """
+    __slots__ = ("mapping", "parent", "root", "item", "items", "annotate", "lineage", "profiler", "identity_map",
+                 "pending", "awaits", "streams", "_path")
+
+    def __init__(self, mapping, parent: 'MappingContext' = None, root=None):
+        self.mapping = mapping
+        self.parent = parent
+        self.root = root
+        self.item = None
+        self.items = {}
+        self._path = None
+        if parent is None:
+            self.annotate = mapping.should_annotate
+            self.lineage = mapping.lineage
+            self.profiler = mapping.profiler
+            self.identity_map = mapping.identity_map
+            self.pending = None
+            self.awaits = False
+            self.streams = None
+        else:
+            self.annotate = parent.annotate
+            self.lineage = parent.lineage
+            self.profiler = parent.profiler
+            self.identity_map = parent.identity_map
+            self.pending = parent.pending
+            self.awaits = parent.awaits
+            self.streams = parent.streams
+
+    def sibling(self):
+        """A new context for the next record found under the same heading, used by mappings of lists."""
+        context = MappingContext(self.mapping, self.parent, self.root)
+        context.pending = self.pending
+        context.awaits = self.awaits
+        context.streams = self.streams
+        return context
+
+    def set_item(self, item):
+        self.item = item
+        if self.parent is not None:
+            self.parent.items[type(item)] = item
+
+    @property
+    def path(self):
+        if self._path is None:
+            if self.parent is not None:
+                prefix = self.parent.path
+                if len(prefix):
+                    prefix += "."
+                self._path = f"{prefix}{self.root}"
+            else:
+                self._path = self.root or ""
+        return self._path
+
+    def get_item(self, item_cls=None, strict=True):
+        """Finds the item values of `item_cls` are stored on: the record's own item, an item created while mapping
+        the record, or an item of an embedding record.
+
+        :param item_cls: the type of item, None for the record's own item.
+        :param strict: only match exact types, otherwise subclasses and generic aliases match as well. Embedding
+            records are always matched on exact types.
+        """
+        if item_cls is None:
+            return self.item
+        context = self
+        if not strict:
+            test = self.mapping.instanceof
+            if test(self.item, item_cls):
+                return self.item
+            for k, item in self.items.items():
+                if test(k, item_cls):
+                    return item
+            context = self.parent
+        # Exact types are a lookup in `items` at every level, walking up the embedding records.
+        while context is not None:
+            if _same_type(context.item, item_cls):
+                return context.item
+            item = context.items.get(item_cls, _Empty)
+            if item is not _Empty:
+                return item
+            context = context.parent
+        return _Empty
+
+
+def _same_type(obj, cls):
+    if isinstance(obj, type):
+        return obj == cls
+    return type(obj) == cls
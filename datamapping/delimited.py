@@ -0,0 +1,63 @@
+"""Delimited (CSV) file sources.
+
+The header of a file is read once and every column is resolved to the steps mapping it, including the lower case
+fallback, into a column plan. Rows are then mapped by index without building a dictionary per row. Columns nothing maps
+are left out of the plan entirely when the mapping does not store unmapped data.
+"""
+import csv
+
+from .encoding import open_text, FALLBACK_ERRORS
+
+__all__ = [
+    "map_csv",
+    "bind_columns",
+    "DEFAULT_BUFFER_SIZE",
+]
+
+# Files are read in chunks of this many bytes.
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+
+def bind_columns(mapping, headings):
+    """Resolves the headings of a file into a column plan.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` the file is mapped with.
+    :param headings: the headings, in column order.
+    :return: tuple of ``(index, heading, steps)``.
+    """
+    store_unmapped = mapping.store_unmapped
+    bound = mapping.get_plan().bind(headings)
+    # Columns tested by filters are kept even when nothing maps them.
+    filtered = set(bound.filters)
+    return tuple((index, heading, steps) for index, (heading, steps) in enumerate(bound)
+                 if steps or store_unmapped or index in filtered)
+
+
+def map_csv(mapping, source, dialect="excel", encoding="utf-8", headings=None, buffer_size=DEFAULT_BUFFER_SIZE,
+            errors=FALLBACK_ERRORS, **fmtparams):
+    """Maps every row of a delimited file.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` to map the rows with.
+    :param source: a path, a binary file object, or a file object opened in text mode with ``newline=""``.
+    :param dialect: the :mod:`csv` dialect, ``fmtparams`` override its attributes.
+    :param encoding: encoding of `source` when it is a path or a binary file, ``"auto"`` to detect it.
+    :param headings: headings of the columns, when omitted the first row is the header.
+    :param buffer_size: size of the chunks the file is read in when `source` is a path.
+    :param errors: how bytes invalid in `encoding` are decoded, as Windows-1252 by default. See
+        :mod:`datamapping.encoding`.
+    :return: generator of mapped items.
+    """
+    with open_text(source, encoding, errors, buffer_size, newline="") as file:
+        yield from _map_file(mapping, file, dialect, headings, fmtparams)
+
+
+def _map_file(mapping, file, dialect, headings, fmtparams):
+    reader = csv.reader(file, dialect, **fmtparams)
+    if headings is None:
+        headings = next(reader, None)
+        if headings is None:
+            return
+    if mapping.get_plan().dynamic_map_item:
+        yield from mapping.map_many(reader, headings)
+    else:
+        yield from mapping.map_columns(reader, bind_columns(mapping, headings))
@@ -0,0 +1,111 @@
+"""Decoding of byte oriented sources.
+
+Feeds are UTF-8, except when they are not: exports from Windows systems mix in Windows-1252 text. The encoding of a file
+is declared or detected once, from its first chunk, and the file is decoded in bulk through a text stream. Bytes that
+are not valid in the encoding fall back to Windows-1252 through the :data:`FALLBACK_ERRORS` error handler, only the
+offending bytes pay for it. Values that reach a mapping as bytes are decoded the same way, see
+:func:`decode_bytes`.
+"""
+import codecs
+import io
+import os
+from contextlib import contextmanager
+
+__all__ = [
+    "decode_bytes",
+    "detect_encoding",
+    "open_text",
+    "AUTO",
+    "FALLBACK_ERRORS",
+    "DETECTION_SAMPLE_SIZE",
+]
+
+# Encoding argument asking for the encoding to be detected.
+AUTO = "auto"
+
+# Error handler decoding the bytes an encoding rejects as Windows-1252.
+FALLBACK_ERRORS = "datamapping-cp1252"
+
+# Bytes looked at to detect the encoding of a file.
+DETECTION_SAMPLE_SIZE = 1 << 16
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _encoding(binary, encoding):
+    if encoding == AUTO:
+        return detect_encoding(binary.peek(DETECTION_SAMPLE_SIZE)[:DETECTION_SAMPLE_SIZE])
+    return encoding
+
+
+def _cp1252_fallback(error):
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    # 5 bytes (0x81, 0x8d, 0x8f, 0x90, 0x9d) are undefined in Windows-1252 as well.
+    return error.object[error.start:error.end].decode("cp1252", "replace"), error.end
+
+
+codecs.register_error(FALLBACK_ERRORS, _cp1252_fallback)
+
+
+def decode_bytes(value, encoding="utf-8"):
+    """Decodes bytes, a bytearray or a memoryview, falling back to Windows-1252 for bytes invalid in `encoding`."""
+    if type(value) is not bytes:
+        value = bytes(value)
+    if value.isascii():
+        return value.decode("ascii")
+    return value.decode(encoding, FALLBACK_ERRORS)
+
+
+def detect_encoding(sample: bytes):
+    """Detects the encoding of a file from its first bytes: the encoding of a byte order mark, else UTF-8 when the
+    sample is valid UTF-8 (ASCII included), else Windows-1252.
+    """
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if sample.isascii():
+        return "utf-8"
+    try:
+        # The sample may end in the middle of a character.
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8"
+
+
+@contextmanager
+def open_text(source, encoding=AUTO, errors=FALLBACK_ERRORS, buffer_size=io.DEFAULT_BUFFER_SIZE, newline=None):
+    """Opens a byte source as text, decoded in chunks of `buffer_size` bytes.
+
+    :param source: a path, a binary file object or a text file object (used as is).
+    :param encoding: the encoding, or :data:`AUTO` to detect it from the first bytes.
+    :param errors: how undecodable bytes are handled, by default they are decoded as Windows-1252.
+    :return: context manager of a text file object. Paths are closed on exit, file objects are left open.
+    """
+    if isinstance(source, io.TextIOBase):
+        yield source
+        return
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, "rb", buffering=buffer_size) as binary:
+            with io.TextIOWrapper(binary, encoding=_encoding(binary, encoding), errors=errors,
+                                  newline=newline) as text:
+                yield text
+        return
+    binary = source
+    if not hasattr(binary, "peek"):
+        binary = io.BufferedReader(binary, buffer_size)
+    text = io.TextIOWrapper(binary, encoding=_encoding(binary, encoding), errors=errors, newline=newline)
+    try:
+        yield text
+    finally:
+        # Detached wrappers leave the caller's file open.
+        text.detach()
+        if binary is not source:
+            binary.detach()
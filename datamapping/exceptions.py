@@ -1,7 +1,11 @@
-__all__ = ["MappingError", "BadEntryException"]
+__all__ = ["MappingError", "BadEntryException", "LazyRecordIgnored"]
 
 
 class MappingError(Exception): ...
 
 
+class LazyRecordIgnored(MappingError):
+    """Raised when the record of a :class:`~datamapping.lazy.LazyItem` already returned is ignored by a converter."""
+
+
 class BadEntryException(Exception): ...
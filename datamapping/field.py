@@ -2,9 +2,12 @@ from dataclasses import dataclass, field, InitVar
 
 import inspect
 import logging
+import sys
 from functools import partial
 from typing import Any, Text, Callable, List
 
+from .cache import make_cache, CachedConverterCall
+
 logger = logging.getLogger("datamapping")
 
 __all__ = [
@@ -13,39 +16,96 @@ __all__ = [
     'FieldMapping',
     'MapTo',
     'Preserve',
+    'StreamedList',
     'TBD'
 ]
 
 
-def map_to(field=None, converter=lambda value, key: value):
+class SetAttribute(object):
+    """Target used for fields mapped by attribute name. Resolving the name once lets the mapping plan store values
+    with a single ``setattr`` instead of going through :meth:`FieldMapping.update_item`.
+    """
+    __slots__ = ("attribute",)
+
+    def __init__(self, attribute):
+        self.attribute = attribute
+
+    def __call__(self, item, value):
+        setattr(item, self.attribute, value)
+
+    def __repr__(self):
+        return f"SetAttribute({self.attribute!r})"
+
+
+class KeywordConverterCall(object):
+    """Call shape for converters whose value argument can only be passed by keyword."""
+    __slots__ = ("converter", "value_arg", "kwargs")
+
+    def __init__(self, converter, value_arg, kwargs):
+        self.converter = converter
+        self.value_arg = value_arg
+        self.kwargs = kwargs
+
+    def __call__(self, value):
+        return self.converter(**{self.value_arg: value}, **self.kwargs)
+
+
+# Field mappings are slotted where dataclasses support it. Slotted dataclasses are recreated by the decorator, so
+# methods of field mappings call their base classes explicitly instead of through super().
+SLOTS = dict(slots=True) if sys.version_info >= (3, 10) else {}
+
+
+def keep_value(value, key):
+    """The default converter, the value is mapped unchanged."""
+    return value
+
+
+def discard(*args):
+    """Target of mappings whose output is not stored."""
+    return None
+
+
+def map_to(field=None, converter=keep_value):
     return FieldMapping(field, converter=converter)
 
 
-@dataclass
+@dataclass(**SLOTS)
 class FieldMapping(object):
     target: Any = field(default=None)
     converter: Callable = field(default=None)
     path: Text = field(default=None)
     context: object = field(default=None)
     target_kwargs: InitVar[dict] = field(default=None)
+    cache: Any = field(default=None, compare=False)
 
     _path_split: Text = field(init=False, default=None)
     _tokenized_path: List[Text] = field(init=False, default=None)
     _name: Text = field(init=False, default="")
+    _embedded: bool = field(init=False, default=False, repr=False, compare=False)
+    _value_positional: bool = field(init=False, default=True, repr=False, compare=False)
+    _converter_call: Callable = field(init=False, default=None, repr=False, compare=False)
+    _converter_path: Text = field(init=False, default=None, repr=False, compare=False)
+    _awaitable: bool = field(init=False, default=False, repr=False, compare=False)
+    converter_arg_map: dict = field(init=False, default=None, repr=False, compare=False)
 
     @property
     def name(self):
         return self._name
 
     def __post_init__(self, target_kwargs=None):
+        self.configure_converter()
+        self.configure_target(target_kwargs=target_kwargs)
+
+    def configure_converter(self):
         from datamapping import SourceMapping
+        self.cache = make_cache(self.cache)
         # special case a to support a cleaner interface for embedded mappings.
         if isinstance(self.converter, type) and issubclass(self.converter, SourceMapping):
             self.converter: SourceMapping = self.converter(root=self.path)
+            self._embedded = True
             self._configure_converter_args(self.converter.map_item)
         elif self.converter is not None:
             self._configure_converter_args(self.converter)
-        self.configure_target(target_kwargs=target_kwargs)
 
     def configure_target(self, force=False, target_kwargs=None):
         if target_kwargs is not None:
@@ -73,8 +133,8 @@ class FieldMapping(object):
                 pass
 
         if isinstance(target, str):
-            self.target = lambda item, value: setattr(item, target, value)
-            self._name = self.target
+            self.target = SetAttribute(target)
+            self._name = target
         else:
             path = self.path
             addendum = ""
@@ -107,25 +167,70 @@ class FieldMapping(object):
 
         return item
 
+    @property
+    def attribute(self):
+        """Name of the attribute this mapping sets, or None when the target is an arbitrary callable."""
+        if isinstance(self.target, SetAttribute):
+            return self.target.attribute
+        return None
+
+    @property
+    def awaitable(self):
+        """Whether the converter is a coroutine function, its values are only available through
+        :meth:`~datamapping.SourceMapping.amap_item` and :meth:`~datamapping.SourceMapping.amap_many`.
+        """
+        return self._awaitable
+
+    @property
+    def converter_cache(self):
+        """The cache of converted values, from the `cache` policy of the field mapping or else from a converter
+        declared :func:`~datamapping.cache.pure`. None when converted values are not cached.
+        """
+        if self.cache is None:
+            return getattr(self.converter, "converter_cache", None)
+        return self.cache
+
+    def compile_converter(self):
+        """Resolves how the converter is called so converting a value is a single call. The result is cached until
+        the path (which is passed as the converter's key) changes.
+
+        :return: a callable taking the value, or None when there is no converter.
+        """
+        if self._converter_path == self.path and self._converter_call is not None:
+            return self._converter_call
+        converter = self.converter
+        if not converter:
+            return None
+        if self._embedded:
+            converter = converter.map_item
+        kwargs = {}
+        if self.converter_arg_map["key"]:
+            kwargs[self.converter_arg_map["key"]] = self.path
+        if not self._value_positional:
+            call = KeywordConverterCall(converter, self.converter_arg_map["value"], kwargs)
+        elif kwargs:
+            call = partial(converter, **kwargs)
+        else:
+            call = converter
+        cache = self.converter_cache
+        # Coroutines can only be awaited once, the converted values of coroutine functions are not cached.
+        if cache is not None and not self._embedded and not self._awaitable:
+            call = CachedConverterCall(call, cache, self.converter, self.path if kwargs else None)
+        self._converter_call = call
+        self._converter_path = self.path
+        return call
+
     def convert(self, value):
-        if self.converter:
-            kwargs = {self.converter_arg_map["value"]: value}
-            if self.converter_arg_map["key"]:
-                kwargs[self.converter_arg_map["key"]] = self.path
-            converter = self.converter
-            from datamapping import SourceMapping
-            if isinstance(converter, SourceMapping):
-                if converter.path is None:
-                    converter.path = self.path
-                converter = converter.map_item
-            try:
-                value = converter(**kwargs)
-            except TypeError:
-                value = converter(*kwargs.values())
+        call = self.compile_converter()
+        if call is not None:
+            value = call(value)
         return value
 
     def _configure_converter_args(self, converter):
         converter_args = inspect.signature(converter).parameters
+        self._awaitable = inspect.iscoroutinefunction(converter) or \
+            inspect.iscoroutinefunction(getattr(converter, "__call__", None))
+        first = next(iter(converter_args.values()), None)
         self.converter_arg_map = {"value": None, "key": None}
         if "value" in converter_args:
             self.converter_arg_map['value'] = "value"
@@ -137,14 +242,18 @@ class FieldMapping(object):
             if value.name == 'self':
                 raise NotImplementedError("Methods intended to be instance bound can not be converters")
             self.converter_arg_map["value"] = value.name
+        self._value_positional = first is not None and first.name == self.converter_arg_map["value"] and \
+            first.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
 
 
-@dataclass
+@dataclass(**SLOTS)
 class Preserve(FieldMapping):
 
     def __post_init__(self, target_kwargs):
         if self.target is not None:
-            super().__post_init__(target_kwargs)
+            FieldMapping.__post_init__(self, target_kwargs)
+        else:
+            self.configure_converter()
 
     def __set_name__(self, owner, name):
         if self.path is None:
@@ -154,9 +263,9 @@ class Preserve(FieldMapping):
             self.configure_target()
 
 
-@dataclass
+@dataclass(**SLOTS)
 class Ignore(FieldMapping):
-    target: Callable = field(default=lambda: "")
+    target: Callable = field(default=discard)
 
     def update_item(self, item, value):
         return None
@@ -165,7 +274,7 @@ class Ignore(FieldMapping):
 Pass = Ignore
 
 
-@dataclass
+@dataclass(**SLOTS)
 class EmbeddedValues(FieldMapping):
     """There are instances where there might be embedded dictionaries but the resulting mapping
     may not follow the same structure. When the values are important but the structure is not a EmbeddedValues
@@ -181,16 +290,39 @@ class EmbeddedValues(FieldMapping):
         :return:
         """
         self.converter = self.target
-        self.target = lambda: None
-        super().__post_init__(target_kwargs)
+        self.target = discard
+        FieldMapping.__post_init__(self, target_kwargs)
+
+
+@dataclass(**SLOTS)
+class StreamedList(FieldMapping):
+    """Maps a list with a :class:`~datamapping.ListMapper` without storing the children on the parent item. Bulk APIs
+    (``map_many``, ``map_columns`` and the file sources) yield the children right after the parent, mapped
+    `chunk_size` at a time, so a record with a huge embedded array never holds all its mapped children. See
+    :mod:`datamapping.streaming`.
+
+    :param target: the :class:`~datamapping.ListMapper` mapping the children.
+    :param back_reference: attribute of the children set to the parent, or to the parent's `parent_key`.
+    :param parent_key: attribute of the parent item referenced by the children, the parent item itself when None.
+    :param chunk_size: children mapped, and held, at once.
+    """
+    back_reference: Text = field(default=None)
+    parent_key: Text = field(default=None)
+    chunk_size: int = field(default=1000)
+
+    def __post_init__(self, target_kwargs):
+        self.converter = self.target
+        self.target = discard
+        FieldMapping.__post_init__(self, target_kwargs)
 
 
-class MapTo(Preserve): ...
+class MapTo(Preserve):
+    __slots__ = ()
 
 
 class TBD(Preserve):
-    pass
+    __slots__ = ()
 
 
 class Unknown(Preserve):
-    pass
+    __slots__ = ()
@@ -0,0 +1,72 @@
+"""Declarative pre-filters of records.
+
+Raising :class:`~datamapping.IgnoreEntry` from a converter skips a record only once its item has been created and the
+fields before it converted. When most rows of a feed are discarded that is most of the work. :class:`KeepIf`
+predicates are declared on the mapping class, test raw values found by the same path resolution as the field mappings,
+and run before the item is created::
+
+    class OrderMapping(SourceMapping):
+        target_collection = Order
+        status = MapTo()
+        open_only = KeepIf("status", lambda status: status == "OPEN")
+        shipped_abroad = KeepIf("address.country", lambda country: country != "US")
+
+A rejected record raises :class:`~datamapping.IgnoreEntry` from ``map_item`` and is skipped by every bulk API, the way
+records ignored by converters are. Rejections are counted per predicate in the ``rejected``
+:class:`~collections.Counter` of the mapping instance, records mapped in worker processes by ``map_parallel`` are not
+counted.
+"""
+import threading
+
+from .exceptions import MappingError
+from .paths import PathTrie, MISSING
+
+__all__ = [
+    "KeepIf",
+]
+
+_count_lock = threading.Lock()
+
+
+class KeepIf(object):
+    """Keeps the records whose value at `path` satisfies `predicate`, the others are rejected before their item is
+    created.
+
+    :param path: path of the value, like the path of a field mapping: a heading, optionally followed by the keys below
+        it. Paths with wildcards hand the predicate the list of values found.
+    :param predicate: callable taking the raw value, returning whether the record is kept.
+    :param keep_missing: whether records the path is missing from are kept, they are rejected by default.
+    :ivar name: name of the predicate on the mapping class, the key of its rejections.
+    """
+    __slots__ = ("path", "predicate", "keep_missing", "name", "heading", "paths")
+
+    def __init__(self, path, predicate, keep_missing=False):
+        self.path = path
+        self.predicate = predicate
+        self.keep_missing = keep_missing
+        self.name = None
+        tokens = path.split(".")
+        self.heading = tokens[0]
+        # A missing path is an expected outcome of a filter, see keep_missing.
+        self.paths = PathTrie([tokens[1:]], [path], report_missing=False) if len(tokens) > 1 else None
+
+    def keeps(self, value):
+        """Whether the record the heading's `value` is from is kept, `value` is :data:`~datamapping.paths.MISSING`
+        when the record has no such heading.
+        """
+        if value is not MISSING and self.paths is not None:
+            value = self.paths.resolve(value, self.heading)[0]
+        if value is MISSING:
+            return self.keep_missing
+        try:
+            return self.predicate(value)
+        except Exception as ex:
+            raise MappingError(f"Error while filtering '{self.path}' with {self.predicate}") from ex
+
+    def __repr__(self):
+        return f"KeepIf({self.path!r}, {self.predicate!r})"
+
+
+def count_rejection(rejected, name):
+    with _count_lock:
+        rejected[name] += 1
@@ -0,0 +1,180 @@
+"""Fixed-width flat file sources.
+
+The file is memory mapped and records are cut out of the map with precomputed offsets, so multi-GB extracts are mapped
+without being read into memory. Only the columns the mapping consumes are extracted, with a single
+:meth:`struct.Struct.unpack_from` per record, and decoded. Records are fed to the mapping through a column plan, see
+:meth:`~datamapping.SourceMapping.map_columns`, no dictionary is built per record.
+"""
+import mmap
+import os
+import struct
+
+from .delimited import bind_columns
+from .encoding import AUTO, FALLBACK_ERRORS, DETECTION_SAMPLE_SIZE, detect_encoding
+
+__all__ = [
+    "Column",
+    "FixedWidthLayout",
+    "map_fixed_width",
+]
+
+
+class Column(object):
+    """A column of a fixed-width file.
+
+    :param name: the heading the column is mapped as.
+    :param offset: offset of the column in the record, in bytes.
+    :param width: width of the column, in bytes.
+    :param encoding: encoding of the column, defaults to the encoding of the layout.
+    """
+    __slots__ = ("name", "offset", "width", "encoding")
+
+    def __init__(self, name, offset, width, encoding=None):
+        self.name = name
+        self.offset = offset
+        self.width = width
+        self.encoding = encoding
+
+    def __repr__(self):
+        return f"Column({self.name!r}, {self.offset}, {self.width})"
+
+
+class FixedWidthLayout(object):
+    """The layout of the records in a fixed-width file.
+
+    :param columns: :class:`Column` objects or ``(name, offset, width[, encoding])`` tuples.
+    :param record_length: length of a record in bytes, including any record separator. When omitted records are
+        separated by new lines (``\\n`` or ``\\r\\n``).
+    :param encoding: encoding of columns not declaring one, ``"auto"`` to detect it from the start of the file.
+    :param strip: strip the padding around values.
+    :param errors: how bytes invalid in their encoding are decoded, as Windows-1252 by default. See
+        :mod:`datamapping.encoding`.
+    """
+
+    def __init__(self, columns, record_length=None, encoding="utf-8", strip=True, errors=FALLBACK_ERRORS):
+        self.columns = tuple(column if isinstance(column, Column) else Column(*column) for column in columns)
+        self.record_length = record_length
+        self.encoding = encoding
+        self.strip = strip
+        self.errors = errors
+
+    @property
+    def headings(self):
+        return [column.name for column in self.columns]
+
+    def extractor(self, indexes, encoding=None):
+        """Builds the function cutting the columns at `indexes` out of a record.
+
+        :param encoding: the encoding of columns not declaring one when the layout detects it.
+        :return: a callable taking ``(buffer, start, end)`` and returning a list of the decoded values.
+        """
+        columns = [self.columns[index] for index in indexes]
+        encodings = tuple(column.encoding or encoding or self.encoding for column in columns)
+        strip = self.strip
+        errors = self.errors
+        order = sorted(range(len(columns)), key=lambda position: columns[position].offset)
+        fmt, cursor = "", 0
+        for position in order:
+            column = columns[position]
+            if column.offset < cursor:
+                # Overlapping columns can't be expressed as a struct, they are sliced one by one.
+                return _SlicingExtractor(columns, encodings, strip, errors)
+            fmt += f"{column.offset - cursor}x{column.width}s"
+            cursor = column.offset + column.width
+        return _StructExtractor(struct.Struct(fmt), order, columns, encodings, strip, errors)
+
+
+class _SlicingExtractor(object):
+    def __init__(self, columns, encodings, strip, errors):
+        self.fields = tuple((column.offset, column.width, encoding) for column, encoding in zip(columns, encodings))
+        self.strip = strip
+        self.errors = errors
+
+    def __call__(self, buffer, start, end):
+        values = []
+        errors = self.errors
+        for offset, width, encoding in self.fields:
+            begin = start + offset
+            value = buffer[begin:min(begin + width, end)].decode(encoding, errors)
+            values.append(value.strip() if self.strip else value)
+        return values
+
+
+class _StructExtractor(object):
+    def __init__(self, layout, order, columns, encodings, strip, errors):
+        self.layout = layout
+        self.unpack_from = layout.unpack_from
+        self.order = order
+        self.encodings = tuple(encodings[position] for position in order)
+        self.strip = strip
+        self.errors = errors
+        self.short_records = _SlicingExtractor(columns, encodings, strip, errors)
+        self.in_order = order == sorted(order)
+
+    def __call__(self, buffer, start, end):
+        if end - start < self.layout.size:
+            return self.short_records(buffer, start, end)
+        raw = self.unpack_from(buffer, start)
+        errors = self.errors
+        if self.strip:
+            values = [value.decode(encoding, errors).strip() for value, encoding in zip(raw, self.encodings)]
+        else:
+            values = [value.decode(encoding, errors) for value, encoding in zip(raw, self.encodings)]
+        if self.in_order:
+            return values
+        ordered = [None] * len(values)
+        for value, position in zip(values, self.order):
+            ordered[position] = value
+        return ordered
+
+
+def _records(buffer, record_length):
+    """Yields the ``(start, end)`` of every record, new line separated unless `record_length` is given."""
+    size = len(buffer)
+    if record_length:
+        for start in range(0, size - size % record_length, record_length):
+            yield start, start + record_length
+        if size % record_length:
+            yield size - size % record_length, size
+        return
+    start = 0
+    find = buffer.find
+    while start < size:
+        end = find(b"\n", start)
+        if end == -1:
+            end = size
+        stop = end
+        if stop > start and buffer[stop - 1] == 13:
+            stop -= 1
+        if stop > start:
+            yield start, stop
+        start = end + 1
+
+
+def map_fixed_width(mapping, source, layout: FixedWidthLayout):
+    """Maps every record of a fixed-width file.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` to map the records with.
+    :param source: path of the file.
+    :param layout: the :class:`FixedWidthLayout` of the records.
+    :return: generator of mapped items.
+    """
+    dynamic = mapping.get_plan().dynamic_map_item
+    if dynamic:
+        # map_item is overridden, it gets every column like any other list row.
+        bound = tuple((index, heading, None) for index, heading in enumerate(layout.headings))
+    else:
+        bound = bind_columns(mapping, layout.headings)
+    columns = tuple((position, heading, steps) for position, (_, heading, steps) in enumerate(bound))
+    with open(source, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            # The encoding is detected once for the whole file.
+            encoding = detect_encoding(buffer[:DETECTION_SAMPLE_SIZE]) if layout.encoding == AUTO else None
+            extract = layout.extractor([index for index, _, _ in bound], encoding)
+            records = (extract(buffer, start, end) for start, end in _records(buffer, layout.record_length))
+            if dynamic:
+                yield from mapping.map_many(records, layout.headings)
+            else:
+                yield from mapping.map_columns(records, columns)
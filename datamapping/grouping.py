@@ -0,0 +1,175 @@
+"""Records spread over several rows of a flat file.
+
+Flat extracts often write one entity as a header row followed by detail rows sharing its key. A :class:`GroupRows`
+declared on the mapping class says how rows are grouped, :func:`map_groups` assembles every group into one nested
+record, the values of its header row plus the list of its detail rows under the `details` heading, and maps it like any
+other record, the details typically with a :class:`~datamapping.ListMapper`::
+
+    class OrderMapping(SourceMapping):
+        target_collection = Order
+        order_id = MapTo()
+        customer = MapTo()
+        lines = FieldMapping(Order.add_line, LineMapping)
+        rows = GroupRows("order_id", details="lines", is_detail=lambda row: row["type"] == "D")
+
+    OrderMapping().map_groups(rows)
+
+Rows sorted, or only grouped, by key are streamed one group at a time. Other rows are sorted by key in runs of
+`spill_size` rows, every run but the last is spilled to a temporary file, and the runs are merged back; memory is
+bounded by `spill_size` rows whatever the size of the input. Groups then come out in key order, the rows of a group in
+their input order.
+"""
+import heapq
+import pickle
+import tempfile
+from itertools import groupby, count, islice
+from operator import itemgetter
+
+from .exceptions import MappingError
+from .paths import heading_value, MISSING
+
+__all__ = [
+    "GroupRows",
+    "map_groups",
+    "DEFAULT_SPILL_SIZE",
+]
+
+# Rows sorted in memory at once when grouping rows that are not sorted by key.
+DEFAULT_SPILL_SIZE = 100000
+
+_INCOMPARABLE = "the keys of rows that are not presorted have to be comparable"
+
+
+class GroupRows(object):
+    """Declares that the rows sharing a key form one record.
+
+    :param key: the heading of the key, or a tuple of headings.
+    :param details: heading the list of detail rows is stored under in the assembled record.
+    :param is_detail: callable taking a row (a dictionary) returning whether it is a detail row. The other rows are
+        header rows, their values are the record's own. By default every row is a detail row and the first row of the
+        group is also its header row.
+    :ivar name: name of the declaration on the mapping class.
+    """
+    __slots__ = ("key", "details", "is_detail", "name")
+
+    def __init__(self, key, details="details", is_detail=None):
+        self.key = key
+        self.details = details
+        self.is_detail = is_detail
+        self.name = None
+
+    def key_of(self, row):
+        """The key of a row.
+
+        :raises MappingError: when the row does not have a heading of the key.
+        """
+        if isinstance(self.key, tuple):
+            return tuple(self._value(row, heading) for heading in self.key)
+        return self._value(row, self.key)
+
+    def _value(self, row, heading):
+        value = heading_value(row, heading)
+        if value is MISSING:
+            raise MappingError(f"A row grouped by {self.name} has no '{heading}' heading")
+        return value
+
+    def assemble(self, rows):
+        """Assembles the rows of a group into one record."""
+        record = {}
+        details = []
+        is_detail = self.is_detail
+        for row in rows:
+            if is_detail is None:
+                if not record:
+                    record.update(row)
+                details.append(row)
+            elif is_detail(row):
+                details.append(row)
+            else:
+                record.update(row)
+        record[self.details] = details
+        return record
+
+    def __repr__(self):
+        return f"GroupRows({self.key!r}, {self.details!r})"
+
+
+def map_groups(mapping, rows, headings=None, presorted=False, spill_size=DEFAULT_SPILL_SIZE):
+    """Maps the records formed by groups of rows, see :class:`GroupRows`.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` declaring a :class:`GroupRows`.
+    :param rows: iterable of dictionaries, or of list/tuple rows described by `headings`.
+    :param headings: the headings of list/tuple rows.
+    :param presorted: whether the rows sharing a key are consecutive, groups are then streamed in input order.
+    :param spill_size: rows sorted in memory at once when the rows are not presorted.
+    :return: generator of mapped items, one per group.
+    :raises MappingError: when a row does not have a heading of the key.
+    """
+    grouping = mapping.get_plan().grouping
+    if grouping is None:
+        raise MappingError(f"{type(mapping).__name__} declares no GroupRows")
+    if headings is not None:
+        rows = (dict(zip(headings, row)) if isinstance(row, (list, tuple)) else row for row in rows)
+    if presorted:
+        groups = (rows for _, rows in groupby(rows, grouping.key_of))
+    else:
+        groups = _sorted_groups(rows, grouping.key_of, spill_size)
+    return mapping.map_many(grouping.assemble(group) for group in groups)
+
+
+def _sorted_groups(rows, key_of, spill_size):
+    sequence = count()
+    # The sequence number keeps the rows of a key in input order, rows are never compared.
+    entries = ((key_of(row), next(sequence), row) for row in rows)
+    files = []
+    try:
+        run = _sorted(list(islice(entries, spill_size)))
+        for entry in entries:
+            # More rows follow, the run in memory is spilled before the next one is read.
+            files.append(_spill(run))
+            run = [entry]
+            run.extend(islice(entries, spill_size - 1))
+            run = _sorted(run)
+        if files:
+            run = _merge([_read(file) for file in files] + [run])
+        for _, group in groupby(run, itemgetter(0)):
+            yield [row for _, _, row in group]
+    finally:
+        for file in files:
+            file.close()
+
+
+def _sorted(run):
+    try:
+        run.sort()
+    except TypeError as ex:
+        raise MappingError(_INCOMPARABLE) from ex
+    return run
+
+
+def _merge(runs):
+    merged = heapq.merge(*runs)
+    while True:
+        try:
+            entry = next(merged)
+        except StopIteration:
+            return
+        except TypeError as ex:
+            raise MappingError(_INCOMPARABLE) from ex
+        yield entry
+
+
+def _spill(run):
+    file = tempfile.TemporaryFile()
+    for entry in run:
+        pickle.dump(entry, file, pickle.HIGHEST_PROTOCOL)
+    file.seek(0)
+    return file
+
+
+def _read(file):
+    while True:
+        try:
+            yield pickle.load(file)
+        except EOFError:
+            return
@@ -0,0 +1,109 @@
+"""Deduplication of entities by natural key.
+
+Normalized feeds repeat the same referenced entity, an owner or a lookup object produced by a converter or an embedded
+mapping, in thousands of rows, each one mapped into a separate object that is then saved again. A class declares the
+attributes identifying its entities with :data:`~datamapping.mappable.mappable`, and an :class:`IdentityMap` given to
+a mapping replaces every value of that class stored on an item by the first one seen with the same key, so repeated
+entities share one object::
+
+    @mappable(key="email")
+    @dataclass
+    class Owner(object):
+        email: Text = field(default=None)
+
+    OrderMapping(identity_map=IdentityMap(scope=PER_BATCH, maxsize=100000)).map_many(rows)
+
+The scope says how long entities are remembered: a record (:data:`PER_RECORD`), a call of ``map_many`` or of a file
+source (:data:`PER_BATCH`), or until the map is cleared (:data:`PER_JOB`). Past `maxsize` entities the least recently
+used (``eviction="lru"``) or the oldest (``eviction="fifo"``) is forgotten. Values whose key has a None attribute are
+left alone.
+"""
+from .cache import ConverterCache
+from .mappable import mappable
+
+__all__ = [
+    "IdentityMap",
+    "PER_RECORD",
+    "PER_BATCH",
+    "PER_JOB",
+]
+
+PER_RECORD = "per-record"
+PER_BATCH = "per-batch"
+PER_JOB = "per-job"
+
+_MISS = object()
+
+
+class IdentityMap(ConverterCache):
+    """The entities seen so far by natural key.
+
+    :param scope: :data:`PER_RECORD`, :data:`PER_BATCH` or :data:`PER_JOB`.
+    :param maxsize: maximum number of entities remembered, None for unbounded.
+    :param eviction: ``"lru"`` or ``"fifo"``, which entity is forgotten past `maxsize`.
+    :ivar hits: values replaced by the entity already seen.
+    :ivar misses: entities seen for the first time.
+    """
+
+    def __init__(self, scope=PER_BATCH, maxsize=None, eviction="lru"):
+        if scope not in (PER_RECORD, PER_BATCH, PER_JOB):
+            raise ValueError(f"Unknown identity map scope {scope!r}")
+        if eviction not in ("lru", "fifo"):
+            raise ValueError(f"Unknown eviction policy {eviction!r}")
+        super().__init__(maxsize)
+        self.scope = scope
+        self.eviction = eviction
+        self._keys = {}
+
+    def canonical(self, value):
+        """The entity already seen with the natural key of `value`, `value` itself when it is the first."""
+        value_type = type(value)
+        try:
+            attributes = self._keys[value_type]
+        except KeyError:
+            attributes = self._keys[value_type] = mappable.natural_key(value_type)
+        if attributes is None:
+            return value
+        key = tuple(getattr(value, attribute) for attribute in attributes)
+        if None in key:
+            return value
+        key = (value_type, key)
+        try:
+            hash(key)
+        except TypeError:
+            return value
+        seen = self.get(key, _MISS)
+        if seen is _MISS:
+            self.put(key, value)
+            return value
+        return seen
+
+    def get(self, key, default=None):
+        if self.eviction == "lru":
+            return super().get(key, default)
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def begin_record(self):
+        """Called when a top level record starts."""
+        if self.scope == PER_RECORD:
+            self.clear()
+
+    def begin_batch(self):
+        if self.scope == PER_BATCH:
+            self.clear()
+
+    def __getstate__(self):
+        return dict(maxsize=self.maxsize, scope=self.scope, eviction=self.eviction)
+
+    def __setstate__(self, state):
+        IdentityMap.__init__(self, **state)
+
+    def __repr__(self):
+        return f"IdentityMap({self.scope!r}, maxsize={self.maxsize}, eviction={self.eviction!r})"
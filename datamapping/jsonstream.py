@@ -0,0 +1,306 @@
+"""Streaming JSON sources.
+
+New line delimited JSON is parsed line by line and a top level JSON array is parsed element by element while the file
+is read in chunks, so the memory needed is bounded by the largest record rather than the file. Records are cut down to
+a projection of the mapping: keys no field mapping consumes are dropped, and headings only read through nested paths
+(``special_case.an_id``) only keep those paths. Mappings storing unmapped data keep every top level key.
+
+Every record is still decoded by the C scanner of :mod:`json` before it is projected. Stepping over unneeded values
+without building them has to be done in Python, which measured several times slower than letting the C scanner build
+and drop them; the scanner in :func:`_skip_value` is only used to tell a value cut off by the end of a chunk from a
+malformed one.
+"""
+import json
+import re
+
+from .encoding import open_text, FALLBACK_ERRORS
+from .paths import WILDCARD
+from .plan import VALUE, IGNORE
+
+__all__ = [
+    "map_json",
+    "iter_json",
+    "Projection",
+    "DEFAULT_CHUNK_SIZE",
+]
+
+# Files are read in chunks of this many characters.
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r"[,\]}\s]")
+_decoder = json.JSONDecoder()
+
+
+class _Incomplete(Exception):
+    """The buffer ends before the value does."""
+
+
+class Projection(object):
+    """The part of a JSON object a mapping needs.
+
+    :ivar keys: key to the :class:`Projection` of its value, None when the whole value is needed.
+    :ivar keep_rest: whether keys not in `keys` are needed (whole) as well.
+    """
+    __slots__ = ("keys", "keep_rest")
+
+    SKIP = object()
+
+    def __init__(self, keys=None, keep_rest=False):
+        self.keys = keys if keys is not None else {}
+        self.keep_rest = keep_rest
+
+    def get(self, key):
+        """:return: the projection of the value of `key`, None for the whole value or :attr:`SKIP`."""
+        try:
+            return self.keys[key]
+        except KeyError:
+            pass
+        if self.keep_rest:
+            return None
+        if isinstance(key, str):
+            # Headings fall back to their lower case, like SourceMapping.get_mappings.
+            return self.keys.get(key.lower(), self.SKIP)
+        return self.SKIP
+
+    def add(self, nodes):
+        """Marks the value at the path `nodes` as needed."""
+        projection = self
+        for node in nodes[:-1]:
+            child = projection.keys.get(node, Projection.SKIP)
+            if child is None:
+                return
+            if child is Projection.SKIP:
+                child = projection.keys[node] = Projection()
+            projection = child
+        projection.keys[nodes[-1]] = None
+
+    def prune(self, value):
+        """Drops the parts of a decoded record that are not needed."""
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        get = self.get
+        for key, item in value.items():
+            child = get(key)
+            if child is None:
+                result[key] = item
+            elif child is not Projection.SKIP:
+                result[key] = child.prune(item)
+        return result
+
+    @classmethod
+    def of(cls, mapping):
+        """The projection of the records mapped by `mapping`, None when the whole record is needed."""
+        plan = mapping.get_plan()
+        if plan.dynamic_map_item or plan.dynamic_map_field:
+            return None
+        projection = cls(keep_rest=mapping.store_unmapped)
+        for heading, steps in plan.headings.items():
+            for step in steps:
+                if step.kind is IGNORE:
+                    continue
+                projection.add((heading,) + _projected(step.nodes if step.kind is VALUE else ()))
+        # The values tested by filters are needed as well.
+        for record_filter in plan.filters:
+            nodes = tuple(record_filter.path.split(".")[1:])
+            projection.add((record_filter.heading,) + _projected(nodes))
+        return projection
+
+
+def _projected(nodes):
+    # Below a list index or wildcard the whole list is needed.
+    for depth, node in enumerate(nodes):
+        if node == WILDCARD or node.isdigit():
+            return nodes[:depth]
+    return nodes
+
+
+def _skip_whitespace(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _skip_value(text, pos):
+    """Finds the end of the value starting at `pos` without building it."""
+    try:
+        char = text[pos]
+    except IndexError:
+        raise _Incomplete()
+    if char == '"':
+        match = _STRING.match(text, pos)
+        if match is None:
+            raise _Incomplete()
+        return match.end()
+    if char in "[{":
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(text, pos)
+            if match is None:
+                raise _Incomplete()
+            char = match.group()
+            if char == '"':
+                string = _STRING.match(text, match.start())
+                if string is None:
+                    raise _Incomplete()
+                pos = string.end()
+                continue
+            pos = match.end()
+            if char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return pos
+    match = _SCALAR_END.search(text, pos)
+    if match is None:
+        raise _Incomplete()
+    return match.start()
+
+
+def _decode(text, pos):
+    try:
+        return _decoder.raw_decode(text, pos)
+    except json.JSONDecodeError:
+        # Either the value is cut off by the end of the buffer or it is malformed, only the latter is an error.
+        _skip_value(text, pos)
+        raise
+
+
+def _expect(text, pos, char):
+    if text[pos:pos + 1] != char:
+        raise json.JSONDecodeError(f"Expecting '{char}'", text, pos)
+
+
+def _expect_end(file, text, pos, chunk_size):
+    """Checks that only whitespace follows `pos` up to the end of the file."""
+    while True:
+        pos = _skip_whitespace(text, pos)
+        if pos < len(text):
+            raise json.JSONDecodeError("Extra data", text, pos)
+        text = file.read(chunk_size)
+        if not text:
+            return
+        pos = 0
+
+
+def _parse_value(text, pos, projection):
+    value, pos = _decode(text, pos)
+    if projection is not None:
+        value = projection.prune(value)
+    return value, pos
+
+
+def _iter_lines(file, projection):
+    for number, line in enumerate(file, 1):
+        pos = _skip_whitespace(line, 0)
+        if pos == len(line):
+            continue
+        try:
+            value, end = _parse_value(line, pos, projection)
+        except _Incomplete:
+            raise json.JSONDecodeError(f"Line {number} is not a complete JSON value", line, len(line))
+        end = _skip_whitespace(line, end)
+        if end < len(line):
+            raise json.JSONDecodeError(f"Extra data on line {number}", line, end)
+        yield value
+
+
+def _iter_array(file, projection, chunk_size):
+    buffer = ""
+    eof = False
+    pos = 0
+    while pos == len(buffer) and not eof:
+        more = file.read(chunk_size)
+        eof = not more
+        buffer += more
+        pos = _skip_whitespace(buffer, 0)
+    _expect(buffer, pos, "[")
+    pos += 1
+    # What was read last: the opening bracket, a value or a comma.
+    last = "["
+    while True:
+        pos = _skip_whitespace(buffer, pos)
+        try:
+            char = buffer[pos] if pos < len(buffer) else None
+            if char is None:
+                raise _Incomplete()
+            if last == ",":
+                if char in ",]":
+                    raise json.JSONDecodeError("Expecting value", buffer, pos)
+            elif char == "]":
+                _expect_end(file, buffer, pos + 1, chunk_size)
+                return
+            elif char == ",":
+                if last == "[":
+                    raise json.JSONDecodeError("Expecting value", buffer, pos)
+                last = ","
+                pos += 1
+                continue
+            elif last == "value":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            if char not in '"[{' and not eof:
+                # A number could continue in the next chunk, "3." would be read as 3.
+                _skip_value(buffer, pos)
+            value, end = _parse_value(buffer, pos, projection)
+        except _Incomplete:
+            if eof:
+                raise json.JSONDecodeError("Unterminated JSON array", buffer, len(buffer))
+            more = file.read(chunk_size)
+            eof = not more
+            buffer = buffer[pos:] + more
+            pos = 0
+            continue
+        yield value
+        last = "value"
+        pos = end
+        if pos >= chunk_size:
+            buffer = buffer[pos:]
+            pos = 0
+
+
+def _first_char(file):
+    start = file.tell()
+    while True:
+        char = file.read(1)
+        if not char or not char.isspace():
+            file.seek(start)
+            return char
+
+
+def iter_json(source, projection: Projection = None, format="auto", encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE,
+              errors=FALLBACK_ERRORS):
+    """Yields the records of a JSON source one at a time.
+
+    :param source: a path, a binary file object or a text file object.
+    :param projection: the parts of the records to build, everything when None.
+    :param format: ``"ndjson"`` for one record per line, ``"array"`` for a top level array of records or ``"auto"`` to
+        decide on the first character of the file (seekable files only).
+    :param encoding: encoding of `source` when it is a path or a binary file, ``"auto"`` to detect it.
+    :param chunk_size: number of characters read at once from a top level array.
+    :param errors: how bytes invalid in `encoding` are decoded, see :mod:`datamapping.encoding`.
+    """
+    with open_text(source, encoding, errors) as file:
+        yield from _iter_json(file, projection, format, chunk_size)
+
+
+def _iter_json(source, projection, format, chunk_size):
+    if format == "auto":
+        format = "array" if _first_char(source) == "[" else "ndjson"
+    if format == "array":
+        yield from _iter_array(source, projection, chunk_size)
+    elif format == "ndjson":
+        yield from _iter_lines(source, projection)
+    else:
+        raise ValueError(f"Unknown JSON format '{format}'")
+
+
+def map_json(mapping, source, format="auto", encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE, errors=FALLBACK_ERRORS):
+    """Maps every record of a JSON source, only building the parts of the records the mapping needs.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` to map the records with.
+    :return: generator of mapped items.
+    """
+    records = iter_json(source, Projection.of(mapping), format, encoding, chunk_size, errors)
+    return mapping.map_many(records)
@@ -0,0 +1,121 @@
+"""Lazily mapped items.
+
+Consumers that read a few attributes of each item before discarding most of them pay for every converter of every
+field when items are mapped eagerly. A mapping created with ``lazy=True`` returns a :class:`LazyItem` from
+``map_item`` and ``map_many`` instead: it holds the raw record and converts a field the first time its attribute is
+read::
+
+    for order in OrderMapping(lazy=True).map_many(rows):
+        if order.status == "OPEN":
+            save(order.materialize())
+
+Only attributes stored by a single plain field mapping of the record's own item are read lazily. Reading any other
+attribute, calling a method or setting an attribute maps the record in full first, as :meth:`LazyItem.materialize`
+does, which also runs ``mapping_complete``. Values read before that are the values of the field mappings, without the
+changes ``mapping_complete`` makes. Embedded records, batched and asynchronous mappings are mapped eagerly, a lazy item
+is meant to be read by a single thread.
+
+Records are only rejected before their item is returned by :class:`~datamapping.filters.KeepIf` predicates. A converter
+raising :class:`~datamapping.IgnoreEntry` runs once the lazy item has been returned, reading the attribute or
+materializing the item then raises a :class:`~datamapping.LazyRecordIgnored`, a :class:`~datamapping.MappingError`,
+instead. :class:`~datamapping.sinks.BulkSink` skips such items.
+"""
+
+__all__ = [
+    "LazyItem",
+    "LazyLayout",
+    "UNRESOLVED",
+]
+
+
+class LazyLayout(object):
+    """Where the values of the steps of a mapping are found in list/tuple rows, computed once per file or headings.
+
+    :ivar columns: tuple of ``(index, heading, steps)``.
+    :ivar positions: step to the ``(index, heading)`` of its column.
+    """
+    __slots__ = ("columns", "positions")
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.positions = {}
+        for index, heading, steps in columns:
+            for step in steps or ():
+                self.positions.setdefault(step, (index, heading))
+
+
+class LazyItem(object):
+    """Proxy of an item that is mapped field by field as its attributes are read.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` mapping the record.
+    :param plan: the :class:`~datamapping.plan.MappingPlan` of the mapping.
+    :param raw_data: the record.
+    :param layout: :class:`LazyLayout` of list/tuple rows, None for dictionaries.
+    """
+    __slots__ = ("_mapping", "_plan", "_raw_data", "_layout", "_values", "_item")
+
+    def __init__(self, mapping, plan, raw_data, layout=None):
+        object.__setattr__(self, "_mapping", mapping)
+        object.__setattr__(self, "_plan", plan)
+        object.__setattr__(self, "_raw_data", raw_data)
+        object.__setattr__(self, "_layout", layout)
+        object.__setattr__(self, "_values", None)
+        object.__setattr__(self, "_item", None)
+
+    @property
+    def materialized(self):
+        return self._item is not None
+
+    def materialize(self):
+        """Maps the record in full, ``mapping_complete`` included, once.
+
+        :return: the mapped item, later reads of the proxy are forwarded to it.
+        """
+        if self._item is None:
+            object.__setattr__(self, "_item", self._mapping._materialize(self._plan, self._raw_data, self._layout))
+            object.__setattr__(self, "_values", None)
+        return self._item
+
+    def __getattr__(self, name):
+        if self._item is None:
+            values = self._values
+            if values is not None and name in values:
+                return values[name]
+            step = self._plan.lazy_step(name)
+            if step is not None:
+                value = self._mapping._lazy_value(step, self._raw_data, self._layout)
+                if value is not UNRESOLVED:
+                    if values is None:
+                        values = {}
+                        object.__setattr__(self, "_values", values)
+                    values[name] = value
+                    return value
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.materialize(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.materialize(), name)
+
+    def __reduce__(self):
+        # Lazy items are pickled, and copied, as their mapped item.
+        return _materialized, (self.materialize(),)
+
+    def __repr__(self):
+        if self._item is not None:
+            return f"LazyItem({self._item!r})"
+        return f"LazyItem({type(self._mapping).__name__}, {sorted(self._values or ())})"
+
+
+def _materialized(item):
+    return item
+
+
+class _Unresolved(object):
+    def __repr__(self):
+        return "UNRESOLVED"
+
+
+# Returned by SourceMapping._lazy_value when the attribute can only be read from the fully mapped item.
+UNRESOLVED = _Unresolved()
@@ -0,0 +1,156 @@
+"""Side-car lineage of mapped values.
+
+Annotating (``should_annotate=True``) wraps every scalar in an :class:`~datamapping.source.AnnotatedValue` carrying its
+path and converter, computed again for every value. A :class:`LineageStore` records the same provenance once per field
+and path as a :class:`Provenance`, and per stored value only keeps the integer reference of its provenance, keyed by
+item and attribute. Mapped values are left untouched::
+
+    lineage = LineageStore()
+    item = OrderMapping(lineage=lineage).map_item(row)
+    lineage.of(item, "customer").path  # "customer.name"
+
+Items are referenced weakly, the lineage of an item is forgotten once it is freed; items that cannot be weakly
+referenced are kept alive until the store is cleared. Items mapped in worker processes by ``map_parallel`` are
+described by a copy of the store in each worker, their lineage is not collected.
+"""
+import threading
+import weakref
+from functools import partial
+
+__all__ = [
+    "LineageStore",
+    "Provenance",
+]
+
+
+class Provenance(object):
+    """Where the values of one field mapping under one path come from.
+
+    :ivar path: the path of the value in the source record.
+    :ivar method: name of the converter, None when the value was not converted or came from an embedded mapping.
+    :ivar converter: the converter, a reference to its docstring through :attr:`docstring`.
+    """
+    __slots__ = ("path", "method", "converter")
+
+    def __init__(self, path, method=None, converter=None):
+        self.path = path
+        self.method = method
+        self.converter = converter
+
+    @property
+    def docstring(self):
+        """Lines of the converter's docstring, like the ``MethodDocstring`` of annotated values."""
+        if self.converter is None:
+            return []
+        return (self.converter.__doc__ or "").strip().split("\n")
+
+    def __repr__(self):
+        return f"Provenance({self.path!r}, {self.method!r})"
+
+
+class LineageStore(object):
+    """Provenance of the values stored on mapped items.
+
+    :ivar provenances: every :class:`Provenance`, values reference them by index.
+    """
+
+    def __init__(self):
+        self.provenances = []
+        self._references = {}
+        # id of the item to (reference to the item, attribute to reference or list of references).
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def reference(self, step, context):
+        """The reference of the provenance of values mapped by a plan step in a context, registered on first use."""
+        key = (step, context.path)
+        try:
+            return self._references[key]
+        except KeyError:
+            pass
+        from .source import SourceMapping
+        prefix = key[1]
+        if len(prefix):
+            prefix += "."
+        converter = step.converter
+        if converter is None or isinstance(converter, SourceMapping):
+            provenance = Provenance(f"{prefix}{step.field_mapping.path}")
+        else:
+            provenance = Provenance(f"{prefix}{step.field_mapping.path}", getattr(converter, "__name__", None),
+                                    converter)
+        with self._lock:
+            reference = self._references.get(key)
+            if reference is None:
+                reference = self._references[key] = len(self.provenances)
+                self.provenances.append(provenance)
+        return reference
+
+    def record(self, item, attribute, reference):
+        """Records that a value stored on `item` through `attribute` has the provenance `reference`. Values stored
+        several times through the same attribute, like items added to a list, keep a list of references.
+        """
+        entry = self._items.get(id(item))
+        if entry is None or entry[0]() is not item:
+            try:
+                reference_to = weakref.ref(item, partial(self._forget, id(item)))
+            except TypeError:
+                # Kept alive until the store is cleared.
+                reference_to = partial(_same, item)
+            entry = self._items[id(item)] = (reference_to, {})
+        attributes = entry[1]
+        previous = attributes.get(attribute)
+        if previous is None:
+            attributes[attribute] = reference
+        elif type(previous) is list:
+            previous.append(reference)
+        else:
+            attributes[attribute] = [previous, reference]
+
+    def lineage(self, item):
+        """:return: dictionary of attribute to the :class:`Provenance` (or list of them) of the values of `item`."""
+        attributes = self._attributes(item)
+        if attributes is None:
+            return {}
+        return {attribute: self._resolve(reference) for attribute, reference in attributes.items()}
+
+    def of(self, item, attribute):
+        """:return: the :class:`Provenance` (or list of them) of a value of `item`, None when not recorded."""
+        reference = (self._attributes(item) or {}).get(attribute)
+        if reference is None:
+            return None
+        return self._resolve(reference)
+
+    def _attributes(self, item):
+        entry = self._items.get(id(item))
+        if entry is None or entry[0]() is not item:
+            return None
+        return entry[1]
+
+    def _forget(self, key, reference_to):
+        # Called when an item is freed, the entry is kept when its id was reused by an item recorded since.
+        entry = self._items.get(key)
+        if entry is not None and entry[0] is reference_to:
+            del self._items[key]
+
+    def _resolve(self, reference):
+        if type(reference) is list:
+            return [self.provenances[index] for index in reference]
+        return self.provenances[reference]
+
+    def __len__(self):
+        return len(self._items)
+
+    def clear(self):
+        """Forgets the items, provenances are kept so references stay valid."""
+        self._items.clear()
+
+    def __getstate__(self):
+        # Stores travel empty, e.g. to worker processes, whose lineage is not collected.
+        return {}
+
+    def __setstate__(self, state):
+        LineageStore.__init__(self)
+
+
+def _same(item):
+    return item
@@ -4,12 +4,18 @@ from ._helpers.generics import get_origin
 
 
 class MappingInfo(object):
+    """Reference to a field of a mappable class, unknown attributes are looked up on the type of the field."""
+    __slots__ = ("owner", "name", "type")
+
     def __init__(self, owner, name, val_type):
         self.owner = owner
         self.name = name
         self.type = val_type
 
     def __getattr__(self, item):
+        if item in MappingInfo.__slots__:
+            # Not set yet, e.g. while unpickling.
+            raise AttributeError(item)
         return getattr(self.type, item)
 
 
@@ -18,20 +24,33 @@ class MappableDecoration(object):
        mappings. This decorator (or just callable) "fixes" a dataclass's class reference to enable Mapping to function
        correctly.
 
+       ``@mappable(key="id")`` also declares the natural key of the class, the attribute, or tuple of attributes,
+       identifying an entity. See :mod:`datamapping.identity`.
+
        :param cls:
+       :param key: the natural key of the class.
        :return:
        """
 
     def __init__(self):
         self._mappable_list = []
+        self._natural_keys = {}
 
-    def __call__(self, cls):
+    def __call__(self, cls=None, key=None):
+        if cls is None and key is not None:
+            return lambda cls: self(cls, key=key)
         o_cls = get_origin(cls) or cls
         if o_cls not in self._mappable_list and is_dataclass(o_cls):
             self.make_mappable(o_cls)
             self._mappable_list.append(o_cls)
+        if key is not None:
+            self._natural_keys[o_cls] = (key,) if isinstance(key, str) else tuple(key)
         return cls
 
+    def natural_key(self, cls):
+        """The attributes of the natural key declared for `cls`, None when it has none."""
+        return self._natural_keys.get(cls)
+
     def is_mappable(self, kls, set=None):
         if set is not None:
             if set:
@@ -0,0 +1,118 @@
+"""Executing mappings on several cores.
+
+Rows are split into chunks and mapped by a pool of threads (:func:`map_threaded`) or processes (:func:`map_parallel`).
+Threads share the mapping instance, which is safe because all per record state lives on a
+:class:`~datamapping.context.MappingContext`; this only pays off on free-threaded builds or with converters releasing
+the GIL.
+
+Mapping classes are not sent to worker processes, a mapping instance pickles as the qualified name of its class plus its
+init arguments and the worker rebuilds it from that name. Mapping classes (and their targets) therefore have to be
+importable, classes defined inside a function can not be mapped in parallel; :func:`map_parallel` checks this with
+:func:`locate_class` before starting any process.
+"""
+import importlib
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
+
+from .exceptions import MappingError
+
+__all__ = [
+    "map_parallel",
+    "map_threaded",
+    "locate_class",
+    "chunked",
+    "execute_chunks",
+]
+
+
+def chunked(rows, size):
+    """Splits an iterable into lists of at most `size` rows."""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def locate_class(module, qualname):
+    """Imports a class by its module and qualified name.
+
+    :raises MappingError: when the class can not be imported, for instance because it is defined inside a function.
+    """
+    if "<locals>" in qualname:
+        raise MappingError(f"{module}.{qualname} is defined inside a function and can not be located by name. "
+                           f"Define it at module level to use it in other processes.")
+    obj = importlib.import_module(module)
+    try:
+        for name in qualname.split("."):
+            obj = getattr(obj, name)
+    except AttributeError as ex:
+        raise MappingError(f"{module}.{qualname} could not be located") from ex
+    return obj
+
+
+def _map_chunk(mapping, headings, chunk):
+    return mapping.map_all(chunk, headings)
+
+
+def execute_chunks(executor, mapping, rows, headings, chunksize, ordered, window):
+    """Maps `rows` in chunks on an executor keeping at most `window` chunks in flight.
+
+    :return: generator of mapped items, in input order when `ordered`, in completion order otherwise.
+    """
+    chunks = chunked(rows, chunksize)
+    pending = deque() if ordered else set()
+    try:
+        for chunk in chunks:
+            future = executor.submit(_map_chunk, mapping, headings, chunk)
+            if ordered:
+                pending.append(future)
+                if len(pending) >= window:
+                    yield from pending.popleft().result()
+            else:
+                pending.add(future)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+        if ordered:
+            while pending:
+                yield from pending.popleft().result()
+        else:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def map_parallel(mapping, rows, headings=None, workers=None, chunksize=500, ordered=True):
+    """Maps `rows` with `mapping` on a pool of worker processes.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` instance, its class must be importable.
+    :param rows: iterable of rows, consumed lazily.
+    :param headings: headings of list/tuple rows.
+    :param workers: number of processes, defaults to the number of CPUs.
+    :param chunksize: number of rows sent to a worker at once.
+    :param ordered: yield items in input order, otherwise as soon as their chunk completes.
+    :return: generator of mapped items.
+    """
+    cls = type(mapping)
+    locate_class(cls.__module__, cls.__qualname__)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from execute_chunks(executor, mapping, rows, headings, chunksize, ordered, window=workers * 2)
+
+
+def map_threaded(mapping, rows, headings=None, workers=None, chunksize=500, ordered=True):
+    """Maps `rows` with `mapping` on a pool of threads all sharing the mapping instance. Arguments are the same as
+    :func:`map_parallel`.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from execute_chunks(executor, mapping, rows, headings, chunksize, ordered, window=workers * 2)
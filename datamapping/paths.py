@@ -0,0 +1,158 @@
+"""Extraction of nested values by path.
+
+The paths of all field mappings under one heading are merged into a :class:`PathTrie` so every shared prefix is
+descended once per record, however many fields read below it. A path token is a key, a list index (``lines.0``) or
+the ``*`` wildcard, which fans out over every element of a list (or every value of a dictionary) the way a
+:class:`~datamapping.ListMapper` does.
+"""
+import logging
+
+logger = logging.getLogger("datamapping")
+
+__all__ = [
+    "PathTrie",
+    "FanOut",
+    "MISSING",
+    "WILDCARD",
+    "heading_value",
+]
+
+WILDCARD = "*"
+
+
+class _Missing(object):
+    def __repr__(self):
+        return "MISSING"
+
+
+# The value of a path that does not exist in the record.
+MISSING = _Missing()
+
+
+class FanOut(list):
+    """The values a path with a wildcard resolved to, each one is mapped on its own."""
+    __slots__ = ()
+
+
+def heading_value(record, heading):
+    """The value of a heading of a dictionary record, :data:`MISSING` when it has none. Like
+    :meth:`~datamapping.plan.MappingPlan.resolve`, headings of the record match once lower cased.
+    """
+    try:
+        return record[heading]
+    except KeyError:
+        pass
+    for key, value in record.items():
+        if isinstance(key, str) and key.lower() == heading:
+            return value
+    return MISSING
+
+
+def _describe(value):
+    try:
+        return ",".join(str(key) for key in value.keys())
+    except AttributeError:
+        return f"{type(value).__name__} of length {len(value)}"
+
+
+class _Node(object):
+    __slots__ = ("token", "index", "wildcard", "children", "positions", "fanned", "fields")
+
+    def __init__(self, token, fanned):
+        self.token = token
+        self.wildcard = token == WILDCARD
+        try:
+            self.index = int(token)
+        except (TypeError, ValueError):
+            self.index = None
+        self.fanned = fanned or self.wildcard
+        self.children = []
+        # Positions of the paths ending at this node.
+        self.positions = []
+        # Names of the fields reading this node or below, used when the node is missing.
+        self.fields = []
+
+    def child(self, token):
+        for child in self.children:
+            if child.token == token:
+                return child
+        child = _Node(token, self.fanned)
+        self.children.append(child)
+        return child
+
+
+class PathTrie(object):
+    """The merged paths below one heading.
+
+    :param paths: the tokens below the heading of every path, in order. An empty path reads the heading's value.
+    :param names: names of the paths, used when reporting missing nodes.
+    :param report_missing: whether missing nodes are logged, a field that is not mapped is worth a warning.
+    """
+
+    def __init__(self, paths, names=None, report_missing=True):
+        names = names or [".".join(path) for path in paths]
+        self.report_missing = report_missing
+        self.size = len(paths)
+        self.root = _Node(None, False)
+        self._fanned = []
+        for position, (path, name) in enumerate(zip(paths, names)):
+            node = self.root
+            node.fields.append(name)
+            for token in path:
+                node = node.child(token)
+                node.fields.append(name)
+            node.positions.append(position)
+            self._fanned.append(node.fanned)
+        self._any_fanned = any(self._fanned)
+
+    def resolve(self, value, header):
+        """Extracts the value of every path from the value of the heading.
+
+        :return: list with, for each path in order, its value, :data:`MISSING`, or a :class:`FanOut` of values for
+            paths with wildcards.
+        """
+        if self._any_fanned:
+            results = [FanOut() if fanned else MISSING for fanned in self._fanned]
+        else:
+            results = [MISSING] * self.size
+        self._visit(self.root, value, header, results)
+        return results
+
+    def _visit(self, node, value, header, results):
+        if node.positions:
+            if node.fanned:
+                for position in node.positions:
+                    results[position].append(value)
+            else:
+                for position in node.positions:
+                    results[position] = value
+        for child in node.children:
+            if child.wildcard:
+                try:
+                    values = value.values()
+                except AttributeError:
+                    values = value
+                try:
+                    values = iter(values)
+                except TypeError:
+                    logger.info(f"{value} can not be iterated by {WILDCARD}")
+                    raise
+                for item in values:
+                    self._visit(child, item, header, results)
+                continue
+            if child.index is not None and isinstance(value, (list, tuple)):
+                key = child.index
+            else:
+                key = child.token
+            try:
+                item = value[key]
+            except (KeyError, IndexError):
+                if not self.report_missing:
+                    continue
+                logger.warning(f"Node '{child.token}' not found on {header}. Nodes found: {_describe(value)}. "
+                               f"Not mapping {', '.join(child.fields)}")
+                continue
+            except TypeError:
+                logger.info(f"{value} can not be sliced by {child.token}")
+                raise
+            self._visit(child, item, header, results)
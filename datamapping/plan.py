@@ -0,0 +1,320 @@
+"""Execution plans compiled once per :class:`~datamapping.SourceMapping` class.
+
+Mapping a row used to re-discover, for every field of every row, how a heading resolves to its field mappings, how
+the converter has to be called, where the value is stored and whether the converter is an embedded mapping. A
+:class:`MappingPlan` answers all of those questions the first time a mapping class is used so the per row loop is only
+lookups and calls.
+"""
+from .batch import BatchConverter
+from .cache import CachedConverterCall
+from .exceptions import MappingError
+from .field import FieldMapping, Ignore, SetAttribute, StreamedList
+from .lazy import LazyLayout
+from .paths import PathTrie
+
+__all__ = [
+    "MappingPlan",
+    "FieldStep",
+    "HeadingSteps",
+    "BoundHeadings",
+    "IGNORE",
+    "VALUE",
+    "EMBEDDED",
+    "LIST",
+]
+
+# Field kinds, pre-classified when the plan is compiled.
+IGNORE = "ignore"  # An Ignore without converter or path, mapping it is a no-op.
+VALUE = "value"  # A plain value, optionally converted by a callable.
+EMBEDDED = "embedded"  # The converter is an embedded SourceMapping.
+LIST = "list"  # The converter is a ListMapper and fans out into several values.
+
+# Heading resolutions are memoized, this bounds how many unknown headings are remembered.
+MAX_RESOLVED_HEADINGS = 4096
+
+
+class FieldStep(object):
+    """Everything needed to map a single :class:`~datamapping.FieldMapping` resolved ahead of time.
+
+    :ivar field_mapping: The declaring field mapping.
+    :ivar kind: One of :data:`IGNORE`, :data:`VALUE`, :data:`EMBEDDED`, :data:`LIST`.
+    :ivar nodes: The path below the heading, walked to reach the value.
+    :ivar paths: :class:`~datamapping.paths.PathTrie` of `nodes`, None when the heading's value is used as is.
+    :ivar converter: The converter declared on the field mapping.
+    :ivar convert: Callable taking the value and returning the converted value, None when there is nothing to convert.
+    :ivar update: Callable taking ``(item, value)`` storing the value, None when the value is not stored.
+    :ivar context: The type of item the value is stored on, None for the mapping's own item.
+    :ivar cached: :class:`~datamapping.cache.CachedConverterCall` for embedded mappings whose items can be reused,
+        None otherwise. Caching of plain converters is part of `convert`.
+    :ivar awaitable: Whether `convert` returns a coroutine, see :mod:`datamapping.asynchronous`.
+    :ivar batched: Whether the converter is a :class:`~datamapping.batch.BatchConverter`.
+    :ivar deferred: Whether the value is stored after the record is mapped when the record is mapped in a batch or
+        asynchronously.
+    :ivar own_item: Whether the value is always stored on the record's own item, resolved by the plan from `context`
+        so no lookup is needed.
+    :ivar streamed: Whether the list is streamed by a :class:`~datamapping.field.StreamedList` instead of being stored.
+    """
+    __slots__ = ("field_mapping", "kind", "nodes", "paths", "converter", "convert", "update", "context", "name",
+                 "cached", "awaitable", "batched", "deferred", "own_item", "streamed")
+
+    def __init__(self, field_mapping: FieldMapping):
+        from .source import SourceMapping, ListMapper
+        self.field_mapping = field_mapping
+        self.nodes = tuple(field_mapping.tokenized_path[1:])
+        self.paths = PathTrie([self.nodes], [field_mapping.path]) if self.nodes else None
+        self.converter = field_mapping.converter
+        self.context = field_mapping.context
+        self.own_item = self.context is None
+        self.name = field_mapping.name
+        if isinstance(self.converter, ListMapper):
+            self.kind = LIST
+        elif isinstance(self.converter, SourceMapping):
+            self.kind = EMBEDDED
+        elif isinstance(field_mapping, Ignore) and not self.converter and not self.nodes:
+            self.kind = IGNORE
+        else:
+            self.kind = VALUE
+        self.streamed = isinstance(field_mapping, StreamedList)
+        if self.streamed and self.kind is not LIST:
+            raise MappingError(f"'{field_mapping.path}' is a StreamedList, its converter has to be a ListMapper")
+
+        self.convert = field_mapping.compile_converter()
+        self.awaitable = self.kind is VALUE and field_mapping.awaitable
+        self.batched = self.kind is VALUE and isinstance(self.converter, BatchConverter)
+        self.deferred = self.awaitable or self.batched
+        self.cached = None
+        cache = field_mapping.converter_cache
+        if cache is not None and self.kind is EMBEDDED and type(self.converter).get_plan().self_contained:
+            self.cached = CachedConverterCall(None, cache, type(self.converter), field_mapping.path)
+        if isinstance(field_mapping, Ignore):
+            self.update = None
+        elif type(field_mapping).update_item is FieldMapping.update_item and field_mapping.attribute is not None:
+            self.update = field_mapping.target
+        else:
+            self.update = field_mapping.update_item
+
+    def __repr__(self):
+        return f"FieldStep({self.kind}, {self.field_mapping.path!r})"
+
+
+class HeadingSteps(tuple):
+    """The steps mapping one heading.
+
+    :ivar paths: :class:`~datamapping.paths.PathTrie` merging the paths of the steps, None when every step uses the
+        heading's value as is.
+    """
+
+    def __new__(cls, steps):
+        self = super().__new__(cls, steps)
+        if any(step.nodes for step in self):
+            self.paths = PathTrie([step.nodes for step in self], [step.field_mapping.path for step in self])
+        else:
+            self.paths = None
+        return self
+
+
+class BoundHeadings(tuple):
+    """The ``(heading, steps)`` of the columns of list/tuple rows, in column order.
+
+    :ivar filters: column of the heading of every filter of the plan, see :meth:`MappingPlan.filter_positions`.
+    """
+
+    def __new__(cls, plan, headings):
+        self = super().__new__(cls, ((heading, plan.resolve(heading)) for heading in headings))
+        self.filters = plan.filter_positions(enumerate(heading for heading, _ in self))
+        self._layout = None
+        return self
+
+    @property
+    def layout(self):
+        """:class:`~datamapping.lazy.LazyLayout` of the columns."""
+        if self._layout is None:
+            self._layout = LazyLayout(tuple((index, heading, steps) for index, (heading, steps) in enumerate(self)))
+        return self._layout
+
+
+class MappingPlan(object):
+    """The compiled form of a mapping class.
+
+    :ivar headings: Heading to the steps mapping it, as declared on the class.
+    :ivar filters: The :class:`~datamapping.filters.KeepIf` predicates declared on the class, records are tested
+        against them before their item is created.
+    :ivar grouping: The :class:`~datamapping.grouping.GroupRows` declared on the class, None when it has none.
+    :ivar dynamic_map_field: True when the class overrides ``map_field``, in which case every field has to go through
+        the override instead of the compiled steps.
+    :ivar dynamic_map_item: True when the class overrides ``map_item``, bulk mapping then calls the override per row.
+    :ivar dynamic_create_data_item: True when the class overrides ``create_data_item``, fields of the target
+        collection are then stored on the item found for their context per record.
+    """
+
+    def __init__(self, mapping_cls):
+        from .source import SourceMapping, ListMapper
+        self.mapping_cls = mapping_cls
+        self.headings = {
+            heading: HeadingSteps(FieldStep(field_mapping) for field_mapping in field_mappings)
+            for heading, field_mappings in mapping_cls._field_mappings.items()
+        }
+        self._steps = {id(step.field_mapping): step for steps in self.headings.values() for step in steps}
+        self._resolved = dict(self.headings)
+        self.filters = mapping_cls._record_filters
+        self.grouping = mapping_cls._record_grouping
+        self.dynamic_map_field = mapping_cls.map_field is not SourceMapping.map_field
+        self.dynamic_map_item = mapping_cls.map_item not in (SourceMapping.map_item, ListMapper.map_item)
+        # An overridden create_data_item may create items of any type, their contexts are then resolved per record.
+        self.dynamic_create_data_item = mapping_cls.create_data_item is not SourceMapping.create_data_item
+        target = mapping_cls.target_collection
+        if target is not None and not self.dynamic_create_data_item:
+            for step in self._steps.values():
+                if step.context is target:
+                    step.own_item = True
+
+    def resolve(self, heading):
+        """Steps mapping a heading, falling back to the lower cased heading like
+        :meth:`~datamapping.SourceMapping.get_mappings`. The answer, including a miss, is memoized.
+
+        :return: :class:`HeadingSteps`, empty when nothing maps the heading.
+        """
+        try:
+            return self._resolved[heading]
+        except KeyError:
+            pass
+        steps = ()
+        if isinstance(heading, str):
+            steps = self.headings.get(heading.lower(), ())
+        if len(self._resolved) < MAX_RESOLVED_HEADINGS:
+            self._resolved[heading] = steps
+        return steps
+
+    def bind(self, headings):
+        """Resolves the headings of list/tuple rows once.
+
+        :return: :class:`BoundHeadings`, tuple of ``(heading, steps)`` in column order.
+        """
+        return BoundHeadings(self, headings)
+
+    def filter_positions(self, columns):
+        """Finds the column of the heading of every filter, falling back to the lower cased heading like
+        :meth:`resolve`.
+
+        :param columns: iterable of ``(index, heading)``.
+        :return: tuple with the index of the column of each filter in order, None when no column has its heading.
+        """
+        if not self.filters:
+            return ()
+        exact = {}
+        lowered = {}
+        for index, heading in columns:
+            exact.setdefault(heading, index)
+            if isinstance(heading, str):
+                lowered.setdefault(heading.lower(), index)
+        return tuple(exact.get(record_filter.heading, lowered.get(record_filter.heading))
+                     for record_filter in self.filters)
+
+    def step(self, field_mapping):
+        """The compiled step of a field mapping declared on the class, compiling a stand alone step for field
+        mappings that are not.
+        """
+        try:
+            return self._steps[id(field_mapping)]
+        except KeyError:
+            return FieldStep(field_mapping)
+
+    @property
+    def steps(self):
+        return tuple(self._steps.values())
+
+    def lazy_step(self, attribute):
+        """The step a :class:`~datamapping.lazy.LazyItem` converts to read `attribute` of the item, None when the
+        attribute can only be read once the record is mapped in full: it is not stored by a single field mapping
+        setting it on the record's own item, with a plain converter or a self contained embedded mapping.
+        """
+        try:
+            return self._lazy_steps.get(attribute)
+        except AttributeError:
+            pass
+        lazy_steps = {}
+        if not self.dynamic_map_field:
+            for step in self.steps:
+                if type(step.update) is SetAttribute:
+                    name = step.update.attribute
+                    # Attributes stored by several steps keep the value of the last one mapped.
+                    lazy_steps[name] = None if name in lazy_steps else step
+        for name, step in lazy_steps.items():
+            if step is None or not step.own_item or step.deferred or step.kind is LIST or step.kind is IGNORE:
+                lazy_steps[name] = None
+            elif step.kind is EMBEDDED and not type(step.converter).get_plan().self_contained:
+                lazy_steps[name] = None
+        self._lazy_steps = lazy_steps
+        return lazy_steps.get(attribute)
+
+    @property
+    def self_contained(self):
+        """Whether records only write into items the mapping creates itself, in which case the item mapped from a
+        value can be cached and reused instead of mapping the value again.
+        """
+        target = self.mapping_cls.target_collection
+        if not target or self.dynamic_map_item or self.dynamic_map_field:
+            return False
+        for step in self.steps:
+            if step.context not in (None, target) or step.kind is LIST:
+                return False
+            if step.kind is EMBEDDED and not type(step.converter).get_plan().self_contained:
+                return False
+        return True
+
+    @property
+    def caches(self):
+        """Every converter cache used by the mapping, including the ones of embedded mappings."""
+        try:
+            return self._caches
+        except AttributeError:
+            pass
+        caches = []
+        for step in self.steps:
+            cache = step.field_mapping.converter_cache
+            if cache is not None and cache not in caches:
+                caches.append(cache)
+            if step.kind is EMBEDDED or step.kind is LIST:
+                caches.extend(cache for cache in type(step.converter).get_plan().caches if cache not in caches)
+        self._caches = caches
+        return caches
+
+    @property
+    def batch_size(self):
+        """Number of records mapped together so their batched keys are resolved at once, the smallest batch size
+        of the batch converters of the mapping and its embedded mappings. None without batch converters.
+        """
+        try:
+            return self._batch_size
+        except AttributeError:
+            pass
+        sizes = []
+        for step in self.steps:
+            if step.batched:
+                sizes.append(step.converter.batch_size)
+            elif step.kind is EMBEDDED or step.kind is LIST:
+                size = type(step.converter).get_plan().batch_size
+                if size is not None:
+                    sizes.append(size)
+        self._batch_size = min(sizes, default=None)
+        return self._batch_size
+
+    @property
+    def streams(self):
+        """Whether the mapping or one of its embedded mappings streams lists, see :mod:`datamapping.streaming`."""
+        try:
+            return self._streams
+        except AttributeError:
+            pass
+        self._streams = False
+        for step in self.steps:
+            if step.streamed or (step.kind is EMBEDDED or step.kind is LIST) and \
+                    type(step.converter).get_plan().streams:
+                self._streams = True
+                break
+        return self._streams
+
+    def begin_batch(self):
+        """Tells the caches a new batch of rows starts."""
+        for cache in self.caches:
+            cache.begin_batch()
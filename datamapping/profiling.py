@@ -0,0 +1,162 @@
+"""Per field profiling of mappings.
+
+A :class:`Profiler` given to a mapping, ``OrderMapping(profiler=Profiler())``, is inherited by every embedded mapping
+of the records it maps and times every field: conversion, storing the value on the item (``update_item``), embedded
+mappings and paths missing from the records. Statistics are aggregated per mapping class and field. Mappings without
+a profiler only pay for checking that they have none.
+
+The report is a dictionary (:meth:`Profiler.report`), JSON (:meth:`Profiler.to_json`), or handed to a callback every
+`every` records so it can be shipped to a metrics system. Records mapped in worker processes by ``map_parallel`` are
+profiled by a copy of the profiler in each worker, their statistics are not collected.
+"""
+import json
+import random
+import threading
+import time
+
+__all__ = [
+    "Profiler",
+    "FieldStats",
+]
+
+# Conversion times kept per field to estimate percentiles.
+SAMPLE_SIZE = 1024
+
+
+class FieldStats(object):
+    """Statistics of one field of one mapping class.
+
+    :ivar calls: values mapped.
+    :ivar convert_time: seconds spent converting values, embedded mappings excluded.
+    :ivar update_time: seconds spent storing values on items.
+    :ivar embedded_time: seconds spent in embedded mappings.
+    :ivar path_misses: records the path of the field was missing from.
+    """
+    __slots__ = ("calls", "convert_time", "update_time", "embedded_time", "path_misses", "_samples", "_random")
+
+    def __init__(self):
+        self.calls = 0
+        self.convert_time = 0.0
+        self.update_time = 0.0
+        self.embedded_time = 0.0
+        self.path_misses = 0
+        self._samples = []
+        self._random = random.Random(0)
+
+    def sample(self, elapsed):
+        # Reservoir sampling keeps a uniform sample of every conversion time.
+        if len(self._samples) < SAMPLE_SIZE:
+            self._samples.append(elapsed)
+        else:
+            index = self._random.randrange(self.calls)
+            if index < SAMPLE_SIZE:
+                self._samples[index] = elapsed
+
+    def percentile(self, percent):
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+    def as_dict(self):
+        return dict(calls=self.calls, convert_time=self.convert_time, convert_p50=self.percentile(50),
+                    convert_p90=self.percentile(90), convert_p99=self.percentile(99), update_time=self.update_time,
+                    embedded_time=self.embedded_time, path_misses=self.path_misses)
+
+
+class Profiler(object):
+    """Collects :class:`FieldStats` per mapping class and field.
+
+    :param callback: called with :meth:`report` every `every` top level records.
+    :param every: number of top level records between calls of `callback`.
+    :param clock: the clock, :func:`time.perf_counter` by default.
+    :ivar records: top level records mapped.
+    """
+
+    def __init__(self, callback=None, every=10000, clock=time.perf_counter):
+        self.callback = callback
+        self.every = every
+        self.clock = clock
+        self.records = 0
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def stats(self, mapping_cls, step):
+        """The :class:`FieldStats` of a plan step of a mapping class."""
+        key = (mapping_cls, step)
+        try:
+            return self._stats[key]
+        except KeyError:
+            with self._lock:
+                return self._stats.setdefault(key, FieldStats())
+
+    def map_step(self, mapping, step, value, header, context):
+        """Maps a value like :meth:`~datamapping.SourceMapping._map_step`, timing each stage."""
+        from .plan import EMBEDDED, LIST
+        from .source import DEFERRED
+        stats = self.stats(type(mapping), step)
+        clock = self.clock
+        start = clock()
+        try:
+            value = mapping._convert_value(step, value, header, context)
+            if step.kind is LIST and value is not DEFERRED:
+                # The embedded items are mapped as they are consumed.
+                value = list(value)
+        finally:
+            elapsed = clock() - start
+            with self._lock:
+                stats.calls += 1
+                if step.kind is EMBEDDED or step.kind is LIST:
+                    stats.embedded_time += elapsed
+                else:
+                    stats.convert_time += elapsed
+                    stats.sample(elapsed)
+        if value is DEFERRED:
+            return
+        start = clock()
+        try:
+            mapping._store_value(step, value, context)
+        finally:
+            elapsed = clock() - start
+            with self._lock:
+                stats.update_time += elapsed
+
+    def path_miss(self, mapping, step):
+        stats = self.stats(type(mapping), step)
+        with self._lock:
+            stats.path_misses += 1
+
+    def record_mapped(self):
+        """Counts a top level record, calling the callback every `every` records."""
+        with self._lock:
+            self.records += 1
+            due = self.callback is not None and self.every and self.records % self.every == 0
+        if due:
+            self.callback(self.report())
+
+    def report(self):
+        """:return: dictionary of mapping class name to field path to the statistics of the field."""
+        report = {}
+        with self._lock:
+            for (mapping_cls, step), stats in self._stats.items():
+                fields = report.setdefault(f"{mapping_cls.__module__}.{mapping_cls.__qualname__}", {})
+                name = step.field_mapping.path
+                if name in fields:
+                    name = f"{name} ({step.name})"
+                fields[name] = stats.as_dict()
+        return report
+
+    def to_json(self, **kwargs):
+        return json.dumps(dict(records=self.records, mappings=self.report()), **kwargs)
+
+    def clear(self):
+        with self._lock:
+            self.records = 0
+            self._stats.clear()
+
+    def __getstate__(self):
+        # Profilers travel empty, e.g. to worker processes, whose statistics are not collected.
+        return dict(callback=self.callback, every=self.every, clock=self.clock)
+
+    def __setstate__(self, state):
+        Profiler.__init__(self, **state)
@@ -0,0 +1,161 @@
+"""Registry of mapping classes, by source type and by kind of record.
+
+:func:`maps` registers a mapping class for the type of the sources it maps, for instance an API model, and/or for a
+kind: the value a discriminator field takes in the records it maps::
+
+    @maps(to=Order, kind="order")
+    class OrderMapping(SourceMapping):
+        ...
+
+:func:`locate` finds the mapping of a source type through its MRO, the answer (including a miss) is cached per type so
+dispatching a record is a dictionary lookup. :func:`route` maps a feed mixing several kinds of records.
+"""
+from typing import Type
+
+from .mappable import mappable
+
+__all__ = [
+    "MappingRegistry",
+    "registry",
+    "locate",
+    "maps",
+    "route",
+]
+
+# Records of one mapping collected before they are mapped together by route.
+DEFAULT_ROUTE_BATCH_SIZE = 500
+
+
+def ascls(obj):
+    if isinstance(obj, type):
+        return obj
+    else:
+        return type(obj)
+
+
+class MappingRegistry(object):
+    """Mapping classes by source type and by kind."""
+
+    def __init__(self):
+        self._by_type = {}
+        self._by_kind = {}
+        # Resolved source types, None for types without a mapping.
+        self._resolved = {}
+
+    def register(self, mapping_cls, source: Type = None, kind=None):
+        """Registers a mapping class for a source type and/or a kind of record."""
+        if source is not None:
+            self._by_type[source] = mapping_cls
+            self._resolved.clear()
+        if kind is not None:
+            self._by_kind[kind] = mapping_cls
+
+    def locate(self, mapped_source):
+        """The mapping class registered for the type of `mapped_source`, or for the closest of its base classes.
+
+        :raises NotImplementedError: when no mapping is registered for the type.
+        """
+        source = ascls(mapped_source)
+        try:
+            mapping = self._resolved[source]
+        except KeyError:
+            mapping = None
+            for cls in getattr(source, "__mro__", (source,)):
+                mapping = self._by_type.get(cls)
+                if mapping is not None:
+                    break
+            self._resolved[source] = mapping
+        if mapping is None:
+            raise NotImplementedError(f"Mapping for {mapped_source} not found")
+        return mapping
+
+    def locate_kind(self, kind):
+        """The mapping class registered for a kind of record.
+
+        :raises NotImplementedError: when no mapping is registered for the kind.
+        """
+        try:
+            return self._by_kind[kind]
+        except (KeyError, TypeError):
+            raise NotImplementedError(f"Mapping for kind {kind!r} not found") from None
+
+    def route(self, records, discriminator=None, batch_size=DEFAULT_ROUTE_BATCH_SIZE):
+        """Maps records of different kinds, each with the mapping registered for it.
+
+        :param records: iterable of records.
+        :param discriminator: how the kind of a record is found: the name of a key (or attribute) holding it, or a
+            callable taking the record. When None records are dispatched on their type, see :meth:`locate`.
+        :param batch_size: number of records of one mapping collected and mapped together with
+            :meth:`~datamapping.SourceMapping.map_many`.
+        :return: generator of mapped items. Items of one mapping keep the order of their records, items of different
+            mappings come out in the order their batches fill up.
+        """
+        if discriminator is None:
+            find = self.locate
+        elif callable(discriminator):
+            def find(record):
+                return self.locate_kind(discriminator(record))
+        else:
+            def find(record):
+                try:
+                    kind = record[discriminator]
+                except (KeyError, TypeError):
+                    kind = getattr(record, discriminator, None)
+                return self.locate_kind(kind)
+
+        mappings = {}
+        batches = {}
+        for record in records:
+            mapping_cls = find(record)
+            try:
+                batch = batches[mapping_cls]
+            except KeyError:
+                batch = batches[mapping_cls] = []
+                mappings[mapping_cls] = mapping_cls()
+            batch.append(record)
+            if len(batch) >= batch_size:
+                batches[mapping_cls] = []
+                yield from mappings[mapping_cls].map_many(batch)
+        for mapping_cls, batch in batches.items():
+            if batch:
+                yield from mappings[mapping_cls].map_many(batch)
+
+    def clear(self):
+        self._by_type.clear()
+        self._by_kind.clear()
+        self._resolved.clear()
+
+
+registry = MappingRegistry()
+
+
+def locate(mapped_source):
+    """Finds the mapping class for a source, see :meth:`MappingRegistry.locate`."""
+    return registry.locate(mapped_source)
+
+
+def route(records, discriminator=None, batch_size=DEFAULT_ROUTE_BATCH_SIZE):
+    """Maps a feed of mixed records, see :meth:`MappingRegistry.route`."""
+    return registry.route(records, discriminator=discriminator, batch_size=batch_size)
+
+
+def maps(to: Type = None, source: Type = None, kind=None):
+    """ A declarative decorator to help specify the relationship a mapping has between Data collections and
+    Data sources.
+
+    :param to: the data collection the mapping creates.
+    :param source: the type of the sources the mapping maps, see :func:`locate`.
+    :param kind: the discriminator value of the records the mapping maps, see :func:`route`.
+    :return:
+    """
+    data_collection = None if to is None else mappable(to)
+
+    def wrapper(mapping_cls):
+        if data_collection:
+            mapping_cls.target_collection = data_collection
+        else:
+            mapping_cls.target_collection = None
+        registry.register(mapping_cls, source=source, kind=kind)
+        return mapping_cls
+
+    return wrapper
@@ -0,0 +1,277 @@
+"""Buffered destinations for mapped items.
+
+:meth:`~datamapping.SourceMapping.each` saves items one at a time, a round trip per item. A :class:`BulkSink` buffers
+mapped items instead and hands them, grouped by item type, to a ``save_many`` hook in batches of `flush_size`::
+
+    sink = BulkSink(lambda item_type, items: item_type.objects.bulk_create(items), flush_size=5000)
+    OrderMapping().map_many(rows, sink=sink)
+
+Batches are saved on a writer thread while the next batch is mapped. At most `max_pending` batches wait for the writer,
+mapping blocks when the writer falls further behind. A batch failing to save is retried item by item, so one bad item
+only loses itself; every failure is recorded in :attr:`BulkSink.errors` and logged.
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import fields, is_dataclass
+
+from .exceptions import LazyRecordIgnored
+from .lazy import LazyItem
+
+logger = logging.getLogger("datamapping")
+
+__all__ = [
+    "BulkSink",
+    "MemorySink",
+    "SQLiteSink",
+    "FlushError",
+    "DEFAULT_FLUSH_SIZE",
+]
+
+# Items buffered before they are saved.
+DEFAULT_FLUSH_SIZE = 5000
+
+_STOP = object()
+
+
+class FlushError(object):
+    """Items of a batch that could not be saved.
+
+    :ivar item_type: type of the items.
+    :ivar items: the items that were not saved.
+    :ivar error: the exception raised while saving them.
+    """
+    __slots__ = ("item_type", "items", "error")
+
+    def __init__(self, item_type, items, error):
+        self.item_type = item_type
+        self.items = items
+        self.error = error
+
+    def __repr__(self):
+        return f"FlushError({self.item_type.__name__}, {len(self.items)} items, {self.error!r})"
+
+
+def save_items(item_type, items):
+    """The default ``save_many`` hook: ``item_type.save_many(items)`` when the type has one, otherwise ``save()`` on
+    every item like :meth:`~datamapping.SourceMapping.each`.
+    """
+    save_many = getattr(item_type, "save_many", None)
+    if save_many is not None:
+        save_many(items)
+        return
+    for item in items:
+        item.save()
+
+
+class BulkSink(object):
+    """Buffers items and saves them in batches on a writer thread.
+
+    :param save_many: callable taking ``(item_type, items)`` saving a batch of items of one type, defaults to
+        :func:`save_items`. Subclasses override :meth:`save_many` instead.
+    :param flush_size: number of items buffered before a batch is saved.
+    :param flush_interval: seconds after which buffered items are saved even if fewer than `flush_size`, checked as
+        items are written. None to only flush on size.
+    :param max_pending: number of batches waiting for the writer before writing blocks.
+    :ivar written: number of items written to the sink.
+    :ivar saved: number of items saved.
+    :ivar flushes: number of batches saved.
+    :ivar errors: :class:`FlushError` of every failed save.
+    """
+
+    def __init__(self, save_many=None, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=None, max_pending=2):
+        if save_many is not None:
+            self.save_many = save_many
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.saved = 0
+        self.flushes = 0
+        self.errors = []
+        self._buffer = {}
+        self._buffered = 0
+        self._flushed_at = time.monotonic()
+        self._batches = queue.Queue(maxsize=max_pending)
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def save_many(self, item_type, items):
+        save_items(item_type, items)
+
+    def write(self, item):
+        """Buffers an item, saving the buffer when it is full or older than `flush_interval`. Lazy items are mapped in
+        full first, those whose record a converter ignores are skipped.
+        """
+        if type(item) is LazyItem:
+            try:
+                item = item.materialize()
+            except LazyRecordIgnored:
+                return
+        self._buffer.setdefault(type(item), []).append(item)
+        self._buffered += 1
+        self.written += 1
+        if self._buffered >= self.flush_size or \
+                (self.flush_interval is not None and time.monotonic() - self._flushed_at >= self.flush_interval):
+            self._submit()
+
+    def consume(self, items):
+        """Writes every item, waits until they are saved and closes the sink. When `items` raises, the items written
+        before are still saved.
+
+        :return: the sink.
+        """
+        try:
+            for item in items:
+                self.write(item)
+        finally:
+            self.close()
+        return self
+
+    def flush(self):
+        """Saves the buffered items and waits for the writer to save every batch."""
+        self._submit()
+        if self._writer is not None:
+            self._batches.join()
+
+    def close(self):
+        """Flushes and stops the writer thread, a later write starts a new one."""
+        self.flush()
+        if self._writer is not None:
+            self._batches.put(_STOP)
+            self._writer.join()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _submit(self):
+        self._flushed_at = time.monotonic()
+        if not self._buffered:
+            return
+        batch, self._buffer, self._buffered = self._buffer, {}, 0
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_batches, name=f"{type(self).__name__}-writer",
+                                            daemon=True)
+            self._writer.start()
+        # Blocks while max_pending batches are waiting, slowing mapping down to the pace of the writer.
+        self._batches.put(batch)
+
+    def _write_batches(self):
+        while True:
+            batch = self._batches.get()
+            try:
+                if batch is _STOP:
+                    return
+                for item_type, items in batch.items():
+                    self._save(item_type, items)
+                with self._lock:
+                    self.flushes += 1
+            finally:
+                self._batches.task_done()
+
+    def _save(self, item_type, items):
+        try:
+            self.save_many(item_type, items)
+        except Exception as ex:
+            logger.warning(f"Saving {len(items)} {item_type.__name__} items failed, saving them one by one: {ex}")
+        else:
+            with self._lock:
+                self.saved += len(items)
+            return
+        for item in items:
+            try:
+                self.save_many(item_type, [item])
+            except Exception as ex:
+                logger.error(f"Saving {item} failed: {ex}")
+                with self._lock:
+                    self.errors.append(FlushError(item_type, [item], ex))
+            else:
+                with self._lock:
+                    self.saved += 1
+
+
+class MemorySink(BulkSink):
+    """Keeps saved items in memory, by item type.
+
+    :ivar items: item type to the list of its saved items.
+    """
+
+    def __init__(self, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=None, max_pending=2):
+        super().__init__(flush_size=flush_size, flush_interval=flush_interval, max_pending=max_pending)
+        self.items = {}
+
+    def save_many(self, item_type, items):
+        self.items.setdefault(item_type, []).extend(items)
+
+
+def _columns(item):
+    if is_dataclass(item):
+        return [f.name for f in fields(item)]
+    return [name for name in vars(item) if not name.startswith("_")]
+
+
+def _sql_value(value):
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    if isinstance(value, (list, tuple, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+class SQLiteSink(BulkSink):
+    """Inserts items into SQLite, one table per item type with a column per field, created when missing.
+
+    :param database: path of the database, or an open :class:`sqlite3.Connection` created with
+        ``check_same_thread=False`` as it is used from the writer thread. A connection opened by the sink is closed
+        with it and opened again by the next write, a given connection is left open.
+    :param tables: item type to table name, the lower cased name of the type by default.
+    """
+
+    def __init__(self, database, tables=None, flush_size=DEFAULT_FLUSH_SIZE, flush_interval=None, max_pending=2):
+        super().__init__(flush_size=flush_size, flush_interval=flush_interval, max_pending=max_pending)
+        if isinstance(database, sqlite3.Connection):
+            self._database = None
+            self._connection = database
+        elif database == ":memory:":
+            # Closing an in-memory database would lose it.
+            self._database = None
+            self._connection = sqlite3.connect(database, check_same_thread=False)
+        else:
+            self._database = database
+            self._connection = None
+        self.tables = dict(tables or {})
+        self._statements = {}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self._database, check_same_thread=False)
+        return self._connection
+
+    def table(self, item_type):
+        return self.tables.get(item_type) or item_type.__name__.lower()
+
+    def close(self):
+        super().close()
+        if self._database is not None and self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def save_many(self, item_type, items):
+        columns = _columns(items[0])
+        statement = self._statements.get((item_type, tuple(columns)))
+        if statement is None:
+            table = self.table(item_type)
+            names = ", ".join(f'"{column}"' for column in columns)
+            self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" ({names})')
+            statement = f'INSERT INTO "{table}" ({names}) VALUES ({", ".join("?" for _ in columns)})'
+            self._statements[(item_type, tuple(columns))] = statement
+        rows = [[_sql_value(getattr(item, column, None)) for column in columns] for item in items]
+        with self.connection:
+            self.connection.executemany(statement, rows)
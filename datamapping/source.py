@@ -1,72 +1,53 @@
-from dataclasses import field, dataclass
+from dataclasses import field, dataclass, fields
 
 import json
 import logging
+from collections import Counter
 from datetime import datetime as DateTime
-from typing import List, Type, TypeVar, Text, Any, get_origin, get_args
-
-from datamapping.exceptions import MappingError
-from datamapping.mappable import mappable
-from ._helpers.generics import is_generic_type, get_bound, get_parameters, get_generic_type
-from .field import FieldMapping, Ignore
+from typing import List, Type, TypeVar, Text, Any
+
+from datamapping.exceptions import MappingError, LazyRecordIgnored
+from ._helpers.generics import is_generic_type, get_generic_type, get_templates, get_origin, get_args, \
+    identity_cached
+from .field import FieldMapping, keep_value
+from .context import MappingContext
+from .delimited import map_csv
+from .encoding import decode_bytes, FALLBACK_ERRORS
+from .fixedwidth import map_fixed_width, FixedWidthLayout
+from .jsonstream import map_json, DEFAULT_CHUNK_SIZE
+from .batch import map_batched
+from .asynchronous import amap_item, amap_many, DEFAULT_CONCURRENCY
+from .parallel import map_parallel, map_threaded
+from .filters import KeepIf, count_rejection
+from .grouping import GroupRows, map_groups, DEFAULT_SPILL_SIZE
+from .lazy import LazyItem, LazyLayout, UNRESOLVED
+from .identity import IdentityMap
+from .lineage import LineageStore
+from .profiling import Profiler
+from .sinks import BulkSink
+from .streaming import map_streamed
+from .paths import FanOut, MISSING, heading_value
+from .registry import locate, maps, route
+from .plan import MappingPlan, LIST, EMBEDDED, IGNORE
 
 logger = logging.getLogger("datamapping")
-_mapping_registry = {}
+
+# Returned by _convert_value for values stored once the record is mapped.
+DEFERRED = object()
+
+# Values of these types are handed to the field mappings as is, anything else is decoded first.
+_PLAIN_TYPES = (int, float, DateTime, str, dict, list)
 
 __all__ = [
     "locate",
     "maps",
+    "route",
     "SourceMapping",
-    "ListMapper"
+    "ListMapper",
+    "IgnoreEntry"
 ]
 
 
-class _Empty(object): ...
-
-
-def ascls(obj):
-    if isinstance(obj, type):
-        return obj
-    else:
-        return type(obj)
-
-
-def locate(mapped_source):
-    source = ascls(mapped_source)
-    try:
-        return _mapping_registry[source]
-    except KeyError:
-        for k, mapping in _mapping_registry.items():
-            if issubclass(source, k):
-                # Cache the result so looping isn't repeated
-                _mapping_registry[source] = mapping
-                return mapping
-    raise NotImplementedError(f"Mapping for {mapped_source} not found")
-
-
-def maps(to: Type = None, ):
-    """ A declarative decorator to help specify the relationship a mapping has between Data collections and
-    Data sources.
-
-    :param target_cls:
-    :param source_system:
-    :param dialect:
-    :return:
-    """
-    data_collection = mappable(to)
-
-    def wrapper(mapping_cls):
-        global _mapping_registry
-
-        if data_collection:
-            mapping_cls.target_collection = data_collection
-        else:
-            mapping_cls.target_collection = None
-        return mapping_cls
-
-    return wrapper
-
-
 class MappingType(type):
     def __new__(cls, name, bases, members):
         # Note that we replace the classdict with a regular
@@ -76,15 +57,27 @@ class MappingType(type):
 
         result = type.__new__(cls, name, bases, dict(members))
         fields = {}
+        filters = []
+        grouping = None
         for k, v in members.items():
             if isinstance(v, FieldMapping):
                 cls.add_field_mapping(v, k, fields)
+            if isinstance(v, KeepIf):
+                v.name = v.name or k
+                filters.append(v)
+            if isinstance(v, GroupRows):
+                if grouping is not None:
+                    raise MappingError(f"{name} declares {grouping.name} and {k}, only one GroupRows is allowed")
+                v.name = v.name or k
+                grouping = v
             if isinstance(v, list):
                 for map in v:
                     if isinstance(map, FieldMapping):
                         cls.add_field_mapping(map, k, fields)
 
         result._field_mappings = fields
+        result._record_filters = tuple(filters)
+        result._record_grouping = grouping
         return dataclass(result)
 
     @staticmethod
@@ -99,23 +92,98 @@ class MappingType(type):
 T_item = TypeVar("T_item")
 
 
-@dataclass
+@dataclass(init=False, repr=False, eq=False)
 class AnnotatedValue(object):
+    """A mapped value with its annotations. Annotations are ``@`` prefixed attributes, ``value.path = ...`` sets
+    ``@path``; the ones set by :meth:`SourceMapping.annotated` are kept in slots, any other in a dictionary created on
+    first use. It is still a dataclass with the single field `value`, and ``vars()`` still lists the value and the
+    annotations, as a copy.
+    """
+    __slots__ = ("value", "_path", "_method", "_docstring", "_annotations")
+
     value: Any
 
+    _SLOTTED = {"@path": "_path", "@MethodExecuted": "_method", "@MethodDocstring": "_docstring"}
+
+    def __init__(self, value: Any):
+        object.__setattr__(self, "value", value)
+        object.__setattr__(self, "_annotations", None)
+
     def __setattr__(self, key, value):
-        if key != "value":
-            key = "@" + key.lstrip("@")
-        super().__setattr__(key, value)
+        if key == "value":
+            object.__setattr__(self, key, value)
+            return
+        key = "@" + key.lstrip("@")
+        slot = AnnotatedValue._SLOTTED.get(key)
+        if slot is not None:
+            object.__setattr__(self, slot, value)
+            return
+        if self._annotations is None:
+            object.__setattr__(self, "_annotations", {})
+        self._annotations[key] = value
+
+    def __getattr__(self, key):
+        if key.startswith("@"):
+            slot = AnnotatedValue._SLOTTED.get(key)
+            if slot is not None:
+                return getattr(self, slot)
+            if self._annotations is not None and key in self._annotations:
+                return self._annotations[key]
+        raise AttributeError(key)
+
+    @property
+    def annotations(self):
+        """The annotations, by their ``@`` prefixed name."""
+        annotations = {}
+        for key, slot in AnnotatedValue._SLOTTED.items():
+            try:
+                annotations[key] = getattr(self, slot)
+            except AttributeError:
+                pass
+        annotations.update(self._annotations or {})
+        return annotations
+
+    @property
+    def __dict__(self):
+        # The attributes of the former unslotted layout, for vars().
+        return dict(value=self.value, **self.annotations)
+
+    def __getstate__(self):
+        return self.value, self.annotations
+
+    def __setstate__(self, state):
+        # Slots are restored directly, __setattr__ would prefix their names.
+        value, annotations = state
+        AnnotatedValue.__init__(self, value)
+        for key, annotation in annotations.items():
+            slot = AnnotatedValue._SLOTTED.get(key)
+            if slot is not None:
+                object.__setattr__(self, slot, annotation)
+            else:
+                if self._annotations is None:
+                    object.__setattr__(self, "_annotations", {})
+                self._annotations[key] = annotation
+
+    def __eq__(self, other):
+        if other.__class__ is self.__class__:
+            return self.value == other.value
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"AnnotatedValue(value={self.value!r})"
 
 
 class SourceMapping(object, metaclass=MappingType):
     target_collection: Type = field(init=False, default=None)
-    _item_cache: dict = field(init=False, default_factory=dict)
-    _parent: 'SourceMapping' = field(init=False, default=None)
-    mapping_item: object = field(init=False, default=None)
     root: Text = field(default=None)
     should_annotate: bool = field(default=False)
+    lineage: LineageStore = field(default=None)
+    profiler: Profiler = field(default=None)
+    lazy: bool = field(default=False)
+    identity_map: IdentityMap = field(default=None)
+    rejected: Counter = field(init=False, default_factory=Counter, repr=False, compare=False)
 
     def create_data_item(self, raw_data=None):
         """While the mapping definition is generally the bulk of the mapping sometimes decisions need made on other
@@ -130,28 +198,15 @@ class SourceMapping(object, metaclass=MappingType):
         if self.target_collection:
             return self.target_collection()
         else:
-            try:
-                return self._parent.mapping_item
-            except AttributeError:
-                raise MappingError("data factory can only be None on embedded mappings. ")
+            raise MappingError("data factory can only be None on embedded mappings. ")
 
     @property
     def path(self):
-        if self._parent:
-            prefix = self._parent.path
-            if len(prefix):
-                prefix += "."
-            path = f"{prefix}{self.root}"
-        else:
-            path = self.root or ""
-        return path
+        return self.root or ""
 
     @property
     def annotate(self):
-        if self._parent:
-            return self._parent.annotate
-        else:
-            return self.should_annotate
+        return self.should_annotate
 
     @property
     def store_unmapped(self) -> bool:
@@ -169,9 +224,21 @@ class SourceMapping(object, metaclass=MappingType):
             return {}
 
     @classmethod
-    def get_mappings(cls, heading: Text) -> List[FieldMapping]:
+    def get_plan(cls) -> MappingPlan:
+        """The execution plan of this mapping class, compiled on first use.
+
+        :return: :class:`~datamapping.plan.MappingPlan`
+        """
+        try:
+            return cls.__dict__["_compiled_plan"]
+        except KeyError:
+            plan = MappingPlan(cls)
+            cls._compiled_plan = plan
+            return plan
 
-        return cls._field_mappings.get(heading, cls._field_mappings.get(heading.lower(), []))
+    @classmethod
+    def get_mappings(cls, heading: Text) -> List[FieldMapping]:
+        return [step.field_mapping for step in cls.get_plan().resolve(heading)]
 
     def mapping_complete(self, item=None):
         """In some cases a field cannot be cleaned when it is set, generally if the value is dependent on some other
@@ -198,139 +265,438 @@ class SourceMapping(object, metaclass=MappingType):
         return lambda self, doc, key, value: ''
 
     @staticmethod
-    def MapTo(field=None, converter=lambda value, key: value, path=None):
+    def MapTo(field=None, converter=keep_value, path=None):
         pass
 
-    def map_item(self, raw_data, headings=None):
-
-        self.initialize_cache()
+    def map_item(self, raw_data, headings=None, context: MappingContext = None):
+        """Maps a single record.
 
+        :param raw_data: a dictionary, or a list/tuple row described by `headings`.
+        :param headings: the headings of a list/tuple row.
+        :param context: the context to map the record in, embedding mappings pass the context of the embedded record.
+            A new top level context is used when omitted.
+        :return: the mapped item.
+        :raises IgnoreEntry: when a :class:`~datamapping.filters.KeepIf` of the mapping rejects the record.
+        """
+        plan = self.get_plan()
         if isinstance(raw_data, (list, tuple)):
-            raw_data = zip(headings or [], raw_data)
+            return self._map_row(plan, plan.bind(headings or ()), raw_data, context)
+        return self._map_row(plan, None, raw_data, context)
+
+    def map_many(self, rows, headings=None, sink: BulkSink = None):
+        """Maps an iterable of rows lazily, one item is yielded per row so arbitrarily large sources can be mapped in
+        constant memory. The mapping plan and the headings of list/tuple rows are resolved once for the whole
+        iterable instead of once per row. Like :class:`ListMapper`, rows raising :class:`IgnoreEntry`, and rows
+        rejected by filters, are skipped. Lazy mappings only run converters once an item is read: a yielded lazy
+        item whose record a converter ignores raises :class:`~datamapping.exceptions.LazyRecordIgnored` when read,
+        items written to a sink are skipped.
+
+        :param rows: iterable of dictionaries or of list/tuple rows.
+        :param headings: the headings of list/tuple rows.
+        :param sink: a :class:`~datamapping.sinks.BulkSink` the items are written to instead of being yielded.
+        :return: generator of mapped items, or the sink once every item is saved when a sink is given.
+        """
+        if sink is not None:
+            return sink.consume(self._map_many(rows, headings))
+        return self._map_many(rows, headings)
+
+    def _map_many(self, rows, headings):
+        plan = self.get_plan()
+        plan.begin_batch()
+        if self.identity_map is not None:
+            self.identity_map.begin_batch()
+        if plan.batch_size is not None or plan.streams:
+            columns = plan.bind(headings or ())
+
+            def map_record(row, context):
+                if plan.dynamic_map_item:
+                    return self.map_item(row, headings, context)
+                return self._map_row(plan, columns if isinstance(row, (list, tuple)) else None, row, context)
+
+            if plan.batch_size is not None:
+                yield from map_batched(self, map_record, rows, plan.batch_size)
+                return
+            yield from map_streamed(self, map_record, rows)
+            return
+        if not plan.dynamic_map_item:
+            yield from self._map_rows(plan, rows, headings, None)
+            return
+        for row in rows:
+            try:
+                item = self.map_item(row, headings)
+            except IgnoreEntry:
+                continue
+            yield item
+
+    def map_all(self, rows, headings=None):
+        """Same as :meth:`map_many` but collects the items into a list."""
+        return list(self.map_many(rows, headings))
+
+    def map_groups(self, rows, headings=None, presorted=False, spill_size=DEFAULT_SPILL_SIZE):
+        """Maps the records formed by several rows sharing a key, as declared by the :class:`GroupRows` of the class.
+        See :func:`datamapping.grouping.map_groups`.
+        """
+        return map_groups(self, rows, headings=headings, presorted=presorted, spill_size=spill_size)
+
+    def map_parallel(self, rows, headings=None, workers=None, chunksize=500, ordered=True):
+        """Maps the rows like :meth:`map_many` but on a pool of worker processes. See
+        :func:`datamapping.parallel.map_parallel`, the mapping class has to be importable by its qualified name.
+        """
+        return map_parallel(self, rows, headings=headings, workers=workers, chunksize=chunksize, ordered=ordered)
+
+    def map_csv(self, source, dialect="excel", encoding="utf-8", headings=None, errors=FALLBACK_ERRORS, **fmtparams):
+        """Maps a delimited file, see :func:`datamapping.delimited.map_csv`."""
+        return map_csv(self, source, dialect=dialect, encoding=encoding, headings=headings, errors=errors,
+                       **fmtparams)
+
+    def map_fixed_width(self, source, layout: FixedWidthLayout):
+        """Maps a memory mapped fixed-width file, see :func:`datamapping.fixedwidth.map_fixed_width`."""
+        return map_fixed_width(self, source, layout)
+
+    def map_json(self, source, format="auto", encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE):
+        """Maps a new line delimited JSON file or a top level JSON array as a stream, see
+        :func:`datamapping.jsonstream.map_json`.
+        """
+        return map_json(self, source, format=format, encoding=encoding, chunk_size=chunk_size)
+
+    def map_threaded(self, rows, headings=None, workers=None, chunksize=500, ordered=True):
+        """Maps the rows like :meth:`map_many` but on a pool of threads sharing this mapping instance. See
+        :func:`datamapping.parallel.map_threaded`.
+        """
+        return map_threaded(self, rows, headings=headings, workers=workers, chunksize=chunksize, ordered=ordered)
+
+    def amap_item(self, raw_data, headings=None):
+        """Maps a single record like :meth:`map_item`, awaiting the converters that are coroutine functions
+        concurrently. See :func:`datamapping.asynchronous.amap_item`.
+        """
+        return amap_item(self, raw_data, headings=headings)
+
+    def amap_many(self, rows, headings=None, concurrency=DEFAULT_CONCURRENCY):
+        """Maps the rows like :meth:`map_many` with up to `concurrency` records awaiting their converters at once.
+        See :func:`datamapping.asynchronous.amap_many`.
+        """
+        return amap_many(self, rows, headings=headings, concurrency=concurrency)
+
+    def __getstate__(self):
+        # Only the configuration is pickled, the per record state is rebuilt by __init__.
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def _map_rows(self, plan, rows, headings, context):
+        columns = plan.bind(headings or ())
+        for row in rows:
+            try:
+                item = self._map_row(plan, columns if isinstance(row, (list, tuple)) else None, row,
+                                     None if context is None else context.sibling())
+            except IgnoreEntry:
+                continue
+            yield item
+
+    def map_columns(self, rows, columns):
+        """Maps list/tuple rows through a column plan, only the columns in the plan are looked at.
+
+        :param rows: iterable of list/tuple rows.
+        :param columns: tuple of ``(index, heading, steps)``, see :func:`datamapping.delimited.bind_columns`.
+        :return: generator of mapped items, rows raising :class:`IgnoreEntry` are skipped.
+        """
+        plan = self.get_plan()
+        plan.begin_batch()
+        if self.identity_map is not None:
+            self.identity_map.begin_batch()
+        width = max((index for index, _, _ in columns), default=-1) + 1
+        filter_positions = plan.filter_positions((index, heading) for index, heading, _ in columns)
+        layout = LazyLayout(columns) if self.lazy else None
+
+        def map_record(row, context):
+            if plan.filters:
+                self._filter(plan, row, filter_positions)
+            if layout is not None and context is None:
+                return LazyItem(self, plan, row, layout)
+            if len(row) >= width:
+                values = ((header, steps, row[index]) for index, header, steps in columns)
+            else:
+                values = ((header, steps, row[index]) for index, header, steps in columns if index < len(row))
+            return self._map_values(plan, values, row, context)
+
+        if plan.batch_size is not None:
+            yield from map_batched(self, map_record, rows, plan.batch_size)
+            return
+        if plan.streams:
+            yield from map_streamed(self, map_record, rows)
+            return
+        for row in rows:
+            try:
+                item = map_record(row, None)
+            except IgnoreEntry:
+                continue
+            yield item
+
+    def _map_row(self, plan, columns, raw_data, context):
+        if plan.filters:
+            self._filter(plan, raw_data, None if columns is None else columns.filters)
+        if self.lazy and context is None and not plan.dynamic_map_item:
+            return LazyItem(self, plan, raw_data, None if columns is None else columns.layout)
+        if columns is None:
+            values = ((header, plan.resolve(header), value) for header, value in raw_data.items())
+        else:
+            values = ((header, steps, value) for (header, steps), value in zip(columns, raw_data))
+        return self._map_values(plan, values, raw_data, context)
+
+    def _filter(self, plan, raw_data, positions):
+        """Raises :class:`IgnoreEntry` when a filter of the mapping rejects the record, before its item is created.
+
+        :param positions: column of the heading of every filter in list/tuple rows, None for dictionaries.
+        """
+        for index, record_filter in enumerate(plan.filters):
+            if positions is None:
+                value = heading_value(raw_data, record_filter.heading)
+            else:
+                position = positions[index]
+                value = raw_data[position] if position is not None and position < len(raw_data) else MISSING
+            if value is not MISSING and not isinstance(value, _PLAIN_TYPES):
+                value = self.decode_value(value)
+            if not record_filter.keeps(value):
+                count_rejection(self.rejected, record_filter.name)
+                raise IgnoreEntry(f"{type(self).__name__}.{record_filter.name} rejected the record")
+
+    def _materialize(self, plan, raw_data, layout):
+        """Maps the record of a :class:`~datamapping.lazy.LazyItem` in full."""
+        if layout is None:
+            values = ((header, plan.resolve(header), value) for header, value in raw_data.items())
         else:
-            raw_data = raw_data.items()
+            values = ((header, steps, raw_data[index]) for index, header, steps in layout.columns
+                      if index < len(raw_data))
+        try:
+            return self._map_values(plan, values, raw_data, None)
+        except IgnoreEntry as ex:
+            raise self._lazily_ignored() from ex
+
+    def _lazy_value(self, step, raw_data, layout):
+        """Converts the value of a single step of a record for a :class:`~datamapping.lazy.LazyItem`.
+
+        :return: the value, :data:`~datamapping.lazy.UNRESOLVED` when the record does not have it and the attribute
+            keeps the value the item was created with.
+        """
+        if layout is None:
+            header = step.field_mapping.tokenized_path[0]
+            value = heading_value(raw_data, header)
+        else:
+            position = layout.positions.get(step)
+            if position is None or position[0] >= len(raw_data):
+                return UNRESOLVED
+            index, header = position
+            value = raw_data[index]
+        if value is MISSING:
+            return UNRESOLVED
+        if not isinstance(value, _PLAIN_TYPES):
+            value = self.decode_value(value)
+        if step.paths is not None:
+            value = step.paths.resolve(value, header)[0]
+            if value is MISSING or type(value) is FanOut:
+                return UNRESOLVED
+        context = MappingContext(self, root=self.root)
+        try:
+            value = self._convert_value(step, value, header, context)
+        except IgnoreEntry as ex:
+            raise self._lazily_ignored() from ex
+        if context.annotate:
+            value = self.annotated(value, step.field_mapping, step.converter, context)
+        return value
+
+    def _lazily_ignored(self):
+        return LazyRecordIgnored(f"{type(self).__name__} ignored the record of a lazy item, it was already returned: "
+                            f"reject records with KeepIf rather than IgnoreEntry when mapping lazily")
+
+    def _map_values(self, plan, values, raw_data, context):
+        context = self.initialize_context(context, raw_data)
+        if context.identity_map is not None and context.parent is None:
+            context.identity_map.begin_record()
         unmapped_data = {}
-        for header, value in raw_data:
-            if not isinstance(value, (int, float, DateTime, str, dict, list)):
-                try:
-                    # CSV wants it all encoded into UTF 8 so we must decode out of UTF8
-                    value = value.decode("utf-8")
-
-                    # We live in a windows world and lots of things are not in any sort of useful thing try this if UTF fails.
-                    value = value.decode("Windows-1252")
-                except Exception as ex:
-                    try:
-                        value = str(value)
-                    except Exception as ex2:
-                        raise ex2 from ex
-
-            field_mappings = self.get_mappings(header)
-            if field_mappings is None or len(field_mappings) == 0:
+        for header, steps, value in values:
+            if not isinstance(value, _PLAIN_TYPES):
+                value = self.decode_value(value)
+
+            if not steps:
                 unmapped_data[header] = value
+            elif plan.dynamic_map_field:
+                for step in steps:
+                    self.map_field(step.field_mapping, value, header, context)
+            elif steps.paths is None:
+                for step in steps:
+                    if step.kind is not IGNORE:
+                        self._map_step(step, value, header, context)
             else:
-                for field_mapping in field_mappings:
-                    self.map_field(field_mapping, value, header)
+                # Shared path prefixes are descended once for all the steps.
+                for step, step_value in zip(steps, steps.paths.resolve(value, header)):
+                    if step_value is MISSING:
+                        if context.profiler is not None:
+                            context.profiler.path_miss(self, step)
+                    elif step.kind is not IGNORE:
+                        self._map_step(step, step_value, header, context)
+        item = context.item
         for k, v in self.unmapped_data(unmapped_data).items():
-            setattr(self.mapping_item, k, v)
-        self.mapping_complete(item=self.mapping_item)
-        return self.mapping_item
+            setattr(item, k, v)
+        if context.pending is not None:
+            # The record is completed once the awaited values are stored.
+            context.pending.append((None, self.mapping_complete, item))
+        else:
+            self.mapping_complete(item=item)
+        if context.profiler is not None and context.parent is None:
+            context.profiler.record_mapped()
+        return item
 
-    def add_parent(self, parent):
-        self._parent = parent
+    @staticmethod
+    def decode_value(value):
+        """Turns a value that is not a plain type into text. Bytes are decoded as UTF-8, falling back to
+        Windows-1252 for the bytes that are not valid UTF-8, anything else is converted with ``str``.
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decode_bytes(value)
+        return str(value)
 
-    def initialize_cache(self):
+    def initialize_context(self, context=None, raw_data=None) -> MappingContext:
+        """Creates the item a record is mapped into.
+
+        :param context: context of the record, a new top level context is created when None.
+        :param raw_data: the record, handed to :meth:`create_data_item`.
+        :return: the context holding the new item.
+        """
+        if context is None:
+            context = MappingContext(self, root=self.root)
         try:
             if self.target_collection:
-                self.mapping_item = self.create_data_item()
+                item = self.create_data_item(raw_data)
+            elif context.parent is not None:
+                item = context.parent.item
             else:
-                try:
-                    self.mapping_item = self._parent.mapping_item
-                except AttributeError:
-                    raise MappingError("data factory can only be None on embedded mappings. ")
-            try:
-                self._parent._item_cache[type(self.mapping_item)] = self.mapping_item
-            except AttributeError:
-                pass
-
+                raise MappingError("data factory can only be None on embedded mappings. ")
+            context.set_item(item)
         except Exception:
             logger.error(f"{type(self).__name__} failed to create item {self.target_collection}")
             raise
-
-    def get_item(self, item_cls=None, strict=True):
-        if strict:
-            test = lambda obj, cls: ascls(obj) == cls
-        else:
-            test = self.instanceof
-        if item_cls is None or test(self.mapping_item, item_cls):
-            return self.mapping_item
-        for k, item in self._item_cache.items():
-            if test(k, item_cls):
-                return item
-        if self._parent is not None:
-            item = self._parent.get_item(item_cls, strict=True)
-            if item is None:
-                item = self._parent.get_item(item_cls, strict=False)
-            return item
-
-        return _Empty
-
-    def map_field(self, field_mapping, value, header):
-        for node in field_mapping.tokenized_path[1:]:
+        return context
+
+    def get_item(self, context: MappingContext, item_cls=None, strict=True):
+        return context.get_item(item_cls, strict)
+
+    def map_field(self, field_mapping, value, header, context: MappingContext):
+        step = self.get_plan().step(field_mapping)
+        if step.kind is IGNORE:
+            return
+        if step.paths is not None:
+            value = step.paths.resolve(value, header)[0]
+            if value is MISSING:
+                if context.profiler is not None:
+                    context.profiler.path_miss(self, step)
+                return
+        self._map_step(step, value, header, context)
+
+    def _map_step(self, step, value, header, context):
+        if type(value) is FanOut:
+            for fanned_value in value:
+                self._map_step(step, fanned_value, header, context)
+            return
+        if context.profiler is not None:
+            context.profiler.map_step(self, step, value, header, context)
+            return
+        value = self._convert_value(step, value, header, context)
+        if value is not DEFERRED:
+            self._store_value(step, value, context)
+
+    def _convert_value(self, step, value, header, context):
+        """Converts a value, returns :data:`DEFERRED` when the value is stored once the record is mapped."""
+        field_converter = step.converter
+        kind = step.kind
+        if kind is EMBEDDED or kind is LIST:
+            if step.streamed:
+                if context.streams is None:
+                    raise MappingError(f"'{header}' is streamed by a StreamedList, map the records with map_many")
+                # The children are mapped once the record is, see datamapping.streaming.
+                context.streams.append((step, value, header, context))
+                return DEFERRED
             try:
-                value = value[node]
-            except KeyError:
-                logger.warning(f"Node '{node}' not found on {header}. Nodes found: {','.join(value.keys())}")
-            except TypeError:
-                logger.info(f"{value} can  ot be sliced by {node}")
+                if step.cached is not None:
+                    value = step.cached.call_with(self._map_embedded, value, field_converter, context, header)
+                else:
+                    value = self._map_embedded(value, field_converter, context, header)
+            except IgnoreEntry:
                 raise
-        field_converter = field_mapping.converter
-        is_mapping = isinstance(field_converter, SourceMapping)
-        if is_mapping:
-            prefix = self.path
-            if len(prefix):
-                prefix += "."
-            field_converter.root = f"{prefix}{header}"
-            field_converter.add_parent(self)
-        try:
+            except Exception as ex:
+                raise MappingError(self._conversion_error(header, value, field_converter)) from ex
+        elif step.convert is not None:
+            if step.deferred:
+                if step.awaitable and not context.awaits:
+                    # Checked before the coroutine is created, only the asynchronous APIs await it.
+                    raise MappingError(f"'{header}' is converted by the coroutine function {field_converter}, "
+                                       f"map it with amap_item or amap_many")
+                if context.pending is not None:
+                    # Batched keys are resolved, and coroutines awaited, once the records are mapped.
+                    deferred = value if step.batched else step.convert(value)
+                    context.pending.append((step, deferred, (header, value, context)))
+                    return DEFERRED
+            try:
+                value = step.convert(value)
+            except IgnoreEntry:
+                raise
+            except Exception as ex:
+                raise MappingError(self._conversion_error(header, value, field_converter)) from ex
+        return value
 
-            value = field_mapping.convert(value)
-        except Exception as ex:
-            msg = f"Error while converting '{header}' to the mappable value using {field_converter}.\n" \
-                  f"{json.dumps(value, indent=' ')} """
-            raise MappingError(msg) from ex
-        self._item_cache[type(value)] = value
-        item = self.get_item(field_mapping.context)
+    @staticmethod
+    def _conversion_error(header, value, converter):
+        return f"Error while converting '{header}' to the mappable value using {converter}.\n" \
+               f"{json.dumps(value, indent=' ')} "
+
+    def _store_value(self, step, value, context):
+        kind = step.kind
+        identity_map = context.identity_map
+        if identity_map is not None and kind is not LIST:
+            # Later fields of the record are stored on the entity kept.
+            value = identity_map.canonical(value)
+        context.items[type(value)] = value
+        update = step.update
+        if update is None:
+            if kind is LIST:
+                # The embedded items still have to be mapped even though they are not stored.
+                for _ in value:
+                    pass
+            return
+        item = context.item if step.own_item else context.get_item(step.context)
+        annotate = context.annotate
+        lineage = context.lineage
+        if lineage is not None:
+            reference = lineage.reference(step, context)
         try:
-            if not isinstance(field_converter, ListMapper):
+            if kind is not LIST:
                 value = [value]
-            for idx, v in enumerate(value):
-                if not isinstance(field_mapping, Ignore):
-                    field_mapping.update_item(item, self.annotated(v, field_mapping, field_converter))
+            for v in value:
+                if identity_map is not None and kind is LIST:
+                    v = identity_map.canonical(v)
+                if annotate:
+                    v = self.annotated(v, step.field_mapping, step.converter, context)
+                update(item, v)
+                if lineage is not None:
+                    lineage.record(item, step.name, reference)
         except (Exception, TypeError) as ex:
-            raise MappingError(f"Error when calling '{field_mapping.name}' on '{item}' with '{value}'") from ex
+            raise MappingError(f"Error when calling '{step.name}' on '{item}' with '{value}'") from ex
+
+    @staticmethod
+    def _map_embedded(value, mapping, context, header):
+        return mapping.map_item(value, context=MappingContext(mapping, context, header))
 
     @staticmethod
     def instanceof(obj, kls):
         if not is_generic_type(kls):
             return isinstance(obj, kls)
 
-        obj_tp = get_generic_type(obj)
-        templates = list(get_bound(t) or t.__constraints__ for t in get_parameters(get_origin(kls)))
-
-        try:
-            if issubclass(type(obj), get_origin(kls)):
-                for bound, obj_sub_tp in zip(templates, get_args(obj_tp)):
-
-                    if not issubclass(obj_sub_tp, bound):
-                        return False
-                return True
-        except TypeError as ex:
-            raise ex
+        return _generic_instance(type(obj), get_generic_type(obj), kls)
 
-    def annotated(self, v, field_mapping, field_converter):
-        if self.annotate and isinstance(v, (str, int, DateTime, float)):
+    def annotated(self, v, field_mapping, field_converter, context: MappingContext):
+        if context.annotate and isinstance(v, (str, int, DateTime, float)):
             v = AnnotatedValue(v)
-            prefix = self.root
+            prefix = context.path
             if len(prefix):
                 prefix += "."
             v.path = f"{prefix}{field_mapping.path}"
@@ -341,6 +707,16 @@ class SourceMapping(object, metaclass=MappingType):
         return v
 
 
+@identity_cached
+def _generic_instance(obj_cls, obj_tp, kls):
+    templates = get_templates(kls)
+    if issubclass(obj_cls, get_origin(kls)):
+        for bound, obj_sub_tp in zip(templates, get_args(obj_tp)):
+            if not issubclass(obj_sub_tp, bound):
+                return False
+        return True
+
+
 class IgnoreEntry(Exception):
     pass
 
@@ -351,17 +727,12 @@ class ListMapper(SourceMapping):
 
     """
 
-    def handle_non_list(self, data, headings):
+    def handle_non_list(self, data, headings, context=None):
         logger.warning(f"List Mapping provided but the value provided is not a list {data}")
-        return super().map_item(data, headings)
+        return super().map_item(data, headings, context)
 
-    def map_item(self, raw_data, headings=None):
+    def map_item(self, raw_data, headings=None, context: MappingContext = None):
         if not isinstance(raw_data, list):
-            self.handle_non_list(raw_data, headings)
-        for idx, item in enumerate(raw_data):
-            try:
-                value = super().map_item(item, headings)
-            except IgnoreEntry:
-                continue
-            else:
-                yield value
+            yield self.handle_non_list(raw_data, headings, context)
+            return
+        yield from self._map_rows(self.get_plan(), raw_data, headings, context)
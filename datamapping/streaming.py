@@ -0,0 +1,77 @@
+"""Streaming of huge embedded lists.
+
+A list mapped by a :class:`~datamapping.ListMapper` is stored child by child on the parent item, a record with a
+million element array holds a million mapped children. A :class:`~datamapping.field.StreamedList` field leaves the
+children out of the parent: while the record is mapped the raw list is only set aside, and once the parent is complete
+the bulk APIs yield it followed by its children, mapped `chunk_size` at a time. Each child references its parent, or
+the parent's key, through `back_reference`::
+
+    class OrderMapping(SourceMapping):
+        target_collection = Order
+        id = MapTo()
+        lines = StreamedList(LineMapping, back_reference="order_id", parent_key="id")
+
+    for item in OrderMapping().map_many(rows, sink=sink): ...
+
+Memory is bounded by `chunk_size` children however long the list, as long as the caller does not keep them, a
+:class:`~datamapping.sinks.BulkSink` given to ``map_many`` saves them in batches. Records with streamed lists can only
+be mapped by the bulk APIs, ``map_item`` and the asynchronous APIs raise a :class:`~datamapping.MappingError`.
+"""
+from .batch import resolve_pending, complete_pending
+from .context import MappingContext
+from .parallel import chunked
+
+__all__ = [
+    "map_streamed",
+    "stream_children",
+]
+
+
+def map_streamed(mapping, map_record, rows):
+    """Maps rows one at a time, each item followed by the children of its streamed lists.
+
+    :param mapping: the :class:`~datamapping.SourceMapping` mapping the rows.
+    :param map_record: callable taking a row and the record's context, returning the item.
+    :return: generator of mapped items and children, rows raising :class:`~datamapping.IgnoreEntry` are skipped.
+    """
+    from .source import IgnoreEntry
+    for row in rows:
+        context = MappingContext(mapping, root=mapping.root)
+        context.streams = []
+        try:
+            item = map_record(row, context)
+        except IgnoreEntry:
+            continue
+        yield item
+        yield from stream_children(context.streams)
+
+
+def stream_children(streams):
+    """Maps the streamed lists set aside while a record was mapped.
+
+    :param streams: list of ``(step, value, header, context)``, the context being the one of the list's parent.
+    :return: generator of the children.
+    """
+    for step, value, header, context in streams:
+        field_mapping = step.field_mapping
+        list_mapping = step.converter
+        back_reference = field_mapping.back_reference
+        if back_reference is not None:
+            parent = context.item
+            reference = parent if field_mapping.parent_key is None else getattr(parent, field_mapping.parent_key)
+        batched = type(list_mapping).get_plan().batch_size is not None
+        chunks = chunked(value, field_mapping.chunk_size) if isinstance(value, list) else [value]
+        for chunk in chunks:
+            list_context = MappingContext(list_mapping, context, header)
+            # Batched keys of the children are resolved per chunk.
+            list_context.pending = [] if batched else None
+            list_context.streams = []
+            children = list(list_mapping.map_item(chunk, context=list_context))
+            if batched:
+                complete_pending(None, list_context.pending, resolve_pending([list_context.pending]))
+            for child in children:
+                if back_reference is not None:
+                    setattr(child, back_reference, reference)
+                yield child
+            # Lists streamed by the children themselves.
+            yield from stream_children(list_context.streams)
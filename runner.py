@@ -1,5 +1,10 @@
+import sys
 
 import pytest
 
 if __name__ == "__main__":
-    pytest.main()
\ No newline at end of file
+    if sys.argv[1:2] == ["benchmark"]:
+        from benchmarks.suite import main
+        main(sys.argv[2:])
+    else:
+        pytest.main()